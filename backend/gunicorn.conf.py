@@ -0,0 +1,39 @@
+"""
+Gunicorn hooks for multi-process Prometheus metrics (see karyon/metrics.py).
+
+Bind address, worker count and timeout are passed on the command line (Dockerfile).
+"""
+import glob
+import os
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def on_starting(server):
+    """
+    Clear metric files of processes that are no longer running, before workers start.
+    Files of live processes (e.g. the embedding server, started before gunicorn) are kept.
+    """
+    multiproc_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if multiproc_dir:
+        os.makedirs(multiproc_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(multiproc_dir, '*.db')):
+            # Files are named <type>_<pid>.db, e.g. counter_123.db or gauge_livesum_123.db
+            pid = os.path.basename(path)[:-len('.db')].rsplit('_', 1)[-1]
+            if not pid.isdigit() or not _pid_alive(int(pid)):
+                os.remove(path)
+
+def child_exit(server, worker):
+    """Drop an exited worker's live gauges so they stop counting towards the totals."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        try:
+            from prometheus_client import multiprocess
+        except ImportError:
+            return
+        multiprocess.mark_process_dead(worker.pid)
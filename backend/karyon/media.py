@@ -0,0 +1,192 @@
+"""
+Media file serving with HTTP range and conditional request support.
+
+Ranges are streamed from disk in bounded blocks so worker memory stays flat
+no matter how large the requested range is. When a front proxy is configured
+(MEDIA_ACCEL_REDIRECT_PREFIX), the transfer is handed off to it entirely via
+an X-Accel-Redirect header and the proxy handles ranges itself.
+"""
+import mimetypes
+import os
+import re
+import uuid
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from karyon.metrics import MEDIA_BYTES_SERVED
+
+RANGE_SPEC_RE = re.compile(r'^\s*(\d*)\s*-\s*(\d*)\s*$')
+
+# More ranges than this in one request is almost certainly abuse; serve the full file instead
+MAX_RANGES = 16
+
+
+def _etag_for(stat):
+    """Strong validator derived from modification time and size."""
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def parse_range_header(header, file_size):
+    """
+    Parse a Range header into a list of (start, end) byte offsets (inclusive).
+
+    Returns:
+        None if the header is missing, malformed or not worth honouring (serve 200),
+        [] if it is well-formed but unsatisfiable (serve 416),
+        otherwise a sorted list of non-overlapping ranges.
+    """
+    if not header or not header.startswith('bytes='):
+        return None
+
+    ranges = []
+    for spec in header[len('bytes='):].split(','):
+        match = RANGE_SPEC_RE.match(spec)
+        if not match or (not match.group(1) and not match.group(2)):
+            return None
+        first, last = match.group(1), match.group(2)
+        if first:
+            start = int(first)
+            end = int(last) if last else file_size - 1
+            if last and end < start:
+                return None
+        else:
+            # Suffix range: the last N bytes
+            suffix = int(last)
+            if suffix == 0:
+                continue
+            start = max(file_size - suffix, 0)
+            end = file_size - 1
+        if start >= file_size:
+            continue
+        ranges.append((start, min(end, file_size - 1)))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    # Coalesce overlapping / adjacent ranges
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _if_range_passes(request, etag, mtime):
+    """If-Range lets the client ask for a range only if the file is unchanged."""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and int(mtime) <= since
+
+
+def _read_blocks(f, start, length, block_size):
+    """Yield `length` bytes of `f` starting at `start`, at most `block_size` at a time."""
+    f.seek(start)
+    remaining = length
+    while remaining > 0:
+        data = f.read(min(block_size, remaining))
+        if not data:
+            break
+        remaining -= len(data)
+        MEDIA_BYTES_SERVED.inc(len(data))
+        yield data
+
+
+def _stream_ranges(fullpath, ranges, block_size, parts=None):
+    """Stream one or more ranges from disk, closing the file when done."""
+    with open(fullpath, 'rb') as f:
+        for idx, (start, end) in enumerate(ranges):
+            if parts:
+                yield parts[idx]
+            yield from _read_blocks(f, start, end - start + 1, block_size)
+        if parts:
+            yield parts[-1]
+
+
+def _set_validators(response, etag, mtime):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(mtime)
+    response['Cache-Control'] = f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve a file from MEDIA_ROOT with Range, ETag and If-* support."""
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except Exception:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+
+    stat = os.stat(fullpath)
+    file_size = stat.st_size
+    etag = _etag_for(stat)
+    content_type, _ = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+
+    # 304 / 412 for If-None-Match, If-Modified-Since, If-Match, If-Unmodified-Since
+    conditional = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if conditional is not None:
+        return _set_validators(conditional, etag, stat.st_mtime)
+
+    # Hand the transfer to the front proxy; it will handle ranges from disk itself
+    accel_prefix = settings.MEDIA_ACCEL_REDIRECT_PREFIX
+    if accel_prefix:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + path.lstrip('/')
+        return _set_validators(response, etag, stat.st_mtime)
+
+    block_size = settings.MEDIA_STREAM_BLOCK_SIZE
+    is_head = request.method == 'HEAD'
+
+    ranges = None
+    if _if_range_passes(request, etag, stat.st_mtime):
+        ranges = parse_range_header(request.META.get('HTTP_RANGE'), file_size)
+
+    if ranges == []:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{file_size}'
+        return _set_validators(response, etag, stat.st_mtime)
+
+    if ranges is None:
+        body = [] if is_head else _stream_ranges(fullpath, [(0, file_size - 1)], block_size)
+        response = StreamingHttpResponse(body, content_type=content_type)
+        response['Content-Length'] = file_size
+        return _set_validators(response, etag, stat.st_mtime)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        body = [] if is_head else _stream_ranges(fullpath, ranges, block_size)
+        response = StreamingHttpResponse(body, status=206, content_type=content_type)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{file_size}'
+        return _set_validators(response, etag, stat.st_mtime)
+
+    # Multiple ranges: multipart/byteranges body with a part header before each range
+    boundary = uuid.uuid4().hex
+    parts = [
+        (f'--{boundary}\r\nContent-Type: {content_type}\r\n'
+         f'Content-Range: bytes {start}-{end}/{file_size}\r\n\r\n').encode()
+        for start, end in ranges
+    ]
+    parts = [parts[0]] + [b'\r\n' + p for p in parts[1:]] + [f'\r\n--{boundary}--\r\n'.encode()]
+    content_length = sum(len(p) for p in parts) + sum(end - start + 1 for start, end in ranges)
+
+    body = [] if is_head else _stream_ranges(fullpath, ranges, block_size, parts=parts)
+    response = StreamingHttpResponse(
+        body, status=206, content_type=f'multipart/byteranges; boundary={boundary}'
+    )
+    response['Content-Length'] = content_length
+    return _set_validators(response, etag, stat.st_mtime)
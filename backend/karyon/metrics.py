@@ -0,0 +1,141 @@
+"""
+Opt-in Prometheus metrics, exposed at /metrics when METRICS_ENABLED is set.
+
+Requires prometheus_client (pip install prometheus-client). When it is missing or
+metrics are disabled, every metric below is a no-op, so instrumented code never
+has to check; with METRICS_ENABLED but no prometheus_client, /metrics answers 503.
+
+Gunicorn runs several worker processes, each with its own counters. With the
+PROMETHEUS_MULTIPROC_DIR environment variable set (the Dockerfile does this) each
+worker writes its values to files in that directory and /metrics aggregates them
+across workers. The directory is created on import; the Dockerfile clears it when
+the container starts, and gunicorn.conf.py clears dead processes' files when
+gunicorn starts and marks exited workers dead.
+"""
+import os
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+MISSING_CLIENT_MESSAGE = "METRICS_ENABLED is set but prometheus_client is not installed (pip install prometheus-client)"
+if settings.METRICS_ENABLED and prometheus_client is None:
+    print(f"{MISSING_CLIENT_MESSAGE}; metrics are disabled")
+
+# Seconds; covers both fast local embedding calls and slow LLM answers
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+class _NoopMetric:
+    """Stands in for a metric when prometheus_client is unavailable or metrics are off."""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def observe(self, amount):
+        pass
+
+    @contextmanager
+    def time(self):
+        yield
+
+    @contextmanager
+    def track_inprogress(self):
+        yield
+
+def _enabled():
+    return prometheus_client is not None and settings.METRICS_ENABLED
+
+# Multi-process mode writes a file per metric type as soon as a metric is defined below,
+# so the directory must exist in every process that imports this module (migrate, shell, ...)
+if _enabled() and os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+def _counter(name, documentation, labelnames=()):
+    if not _enabled():
+        return _NoopMetric()
+    return prometheus_client.Counter(name, documentation, labelnames)
+
+def _histogram(name, documentation, labelnames=()):
+    if not _enabled():
+        return _NoopMetric()
+    return prometheus_client.Histogram(name, documentation, labelnames, buckets=LATENCY_BUCKETS)
+
+def _gauge(name, documentation, labelnames=()):
+    if not _enabled():
+        return _NoopMetric()
+    # livesum: add up the values of workers that are still running
+    return prometheus_client.Gauge(name, documentation, labelnames, multiprocess_mode='livesum')
+
+ASK_LATENCY = _histogram(
+    'karyon_ask_latency_seconds', "Time to answer a question, by outcome", ['outcome'])
+EMBEDDING_INFERENCE = _histogram(
+    'karyon_embedding_inference_seconds', "Embedding model encode() time, by caller", ['kind'])
+OPENAI_LATENCY = _histogram(
+    'karyon_openai_request_seconds', "OpenAI HTTP request latency, by endpoint", ['endpoint'])
+OPENAI_ERRORS = _counter(
+    'karyon_openai_errors_total', "Failed OpenAI HTTP requests, by endpoint and error", ['endpoint', 'error'])
+INGEST_QUEUED = _gauge(
+    'karyon_ingest_jobs_queued', "Ingest jobs submitted but not started")
+INGEST_IN_FLIGHT = _gauge(
+    'karyon_ingest_jobs_in_flight', "Ingest jobs currently running, by kind", ['kind'])
+FRAMES_ANALYZED = _counter(
+    'karyon_frames_analyzed_total', "Keyframes analyzed, by source (vision or ocr)", ['source'])
+CACHE_REQUESTS = _counter(
+    'karyon_cache_requests_total', "Cache lookups, by cache and result (hit or miss)", ['cache', 'result'])
+MEDIA_BYTES_SERVED = _counter(
+    'karyon_media_bytes_served_total', "Bytes streamed by serve_media")
+
+def cache_lookup(cache, hit):
+    """Count a hit or miss for a named cache."""
+    CACHE_REQUESTS.labels(cache=cache, result='hit' if hit else 'miss').inc()
+
+@contextmanager
+def ingest_job(kind):
+    """Mark a queued ingest job as started and running until the block exits."""
+    INGEST_QUEUED.dec()
+    with INGEST_IN_FLIGHT.labels(kind=kind).track_inprogress():
+        yield
+
+@contextmanager
+def observe_seconds(histogram, **labels):
+    """Observe the wall time of the enclosed block on a histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(**labels).observe(time.perf_counter() - start)
+
+def metrics_view(request):
+    """
+    Prometheus exposition endpoint.
+
+    If METRICS_TOKEN is set, scrapers must send `Authorization: Bearer <token>`.
+    """
+    token = settings.METRICS_TOKEN
+    if token and request.META.get('HTTP_AUTHORIZATION') != f'Bearer {token}':
+        return HttpResponseForbidden()
+    if prometheus_client is None:
+        return HttpResponse(MISSING_CLIENT_MESSAGE, status=503, content_type='text/plain')
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return HttpResponse(prometheus_client.generate_latest(registry),
+                        content_type=prometheus_client.CONTENT_TYPE_LATEST)
@@ -49,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "karyon.timing.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -130,6 +131,19 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 # Media files (user uploads)
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# Media serving (see karyon/media.py)
+MEDIA_CACHE_MAX_AGE = int(os.getenv("MEDIA_CACHE_MAX_AGE", "3600"))
+MEDIA_STREAM_BLOCK_SIZE = int(os.getenv("MEDIA_STREAM_BLOCK_SIZE", str(256 * 1024)))
+# Internal location prefix for nginx X-Accel-Redirect hand-off, e.g. "/protected-media/"
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv("MEDIA_ACCEL_REDIRECT_PREFIX", "")
+# Media lifecycle (see videos/storage.py): delete the extracted MP3 once a video is ready,
+# and cap the original media each user stores (0 = unlimited)
+STORAGE_DELETE_AUDIO_AFTER_READY = os.getenv("STORAGE_DELETE_AUDIO_AFTER_READY", "True").lower() in ("true", "1", "yes")
+STORAGE_USER_QUOTA_MB = int(os.getenv("STORAGE_USER_QUOTA_MB", "0"))
+
+# Playback renditions built at ingest (see videos/renditions.py): "off" or "faststart"
+PLAYBACK_RENDITIONS = os.getenv("PLAYBACK_RENDITIONS", "off").lower()
+PLAYBACK_X264_PRESET = os.getenv("PLAYBACK_X264_PRESET", "veryfast")
 
 # CORS settings
 CORS_ALLOWED_ORIGINS = os.getenv("CORS_ALLOWED_ORIGINS", "http://localhost:3000,http://localhost:3001,http://localhost:5173").split(",")
@@ -146,7 +160,7 @@ CSRF_TRUSTED_ORIGINS = [
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'karyon.timing.TimedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -164,6 +178,103 @@ SIMPLE_JWT = {
 
 OPENAI_API_KEY = os.getenv("OPEN_AI_KEY")
 
+# OpenAI client pool (see videos/llm.py). Point OPENAI_BASE_URL at `manage.py openai_standin` to run offline.
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")
+OPENAI_CLIENT_CACHE_SIZE = int(os.getenv("OPENAI_CLIENT_CACHE_SIZE", "64"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+OPENAI_TRANSCRIPTION_TIMEOUT = float(os.getenv("OPENAI_TRANSCRIPTION_TIMEOUT", "600"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+# Run the audio and visual branches of 'both' mode concurrently (see videos/stage_graph.py)
+PIPELINE_CONCURRENT_BRANCHES = os.getenv("PIPELINE_CONCURRENT_BRANCHES", "True").lower() in ("true", "1", "yes")
+# Decode videos with a visual branch once with ffmpeg (audio + low-res scan stream, see
+# videos/demux.py) instead of separately with pydub and OpenCV; frames scanned per second
+PIPELINE_SINGLE_PASS_DEMUX = os.getenv("PIPELINE_SINGLE_PASS_DEMUX", "True").lower() in ("true", "1", "yes")
+PIPELINE_SCAN_FPS = float(os.getenv("PIPELINE_SCAN_FPS", "2"))
+
+# Transcription backend: "openai" (whisper-1 API) or "local" (faster-whisper on CPU)
+TRANSCRIPTION_BACKEND = os.getenv("TRANSCRIPTION_BACKEND", "openai")
+LOCAL_WHISPER_MODEL = os.getenv("LOCAL_WHISPER_MODEL", "small")
+LOCAL_WHISPER_COMPUTE_TYPE = os.getenv("LOCAL_WHISPER_COMPUTE_TYPE", "int8")
+LOCAL_WHISPER_CPU_THREADS = int(os.getenv("LOCAL_WHISPER_CPU_THREADS", "4"))
+LOCAL_WHISPER_NUM_WORKERS = int(os.getenv("LOCAL_WHISPER_NUM_WORKERS", "2"))
+
+# Local OCR pre-pass for keyframes (see videos/ocr.py); frames it can't handle go to GPT-4o
+FRAME_OCR_ENABLED = os.getenv("FRAME_OCR_ENABLED", "True").lower() in ("true", "1", "yes")
+FRAME_OCR_MIN_CONFIDENCE = float(os.getenv("FRAME_OCR_MIN_CONFIDENCE", "80"))
+FRAME_OCR_MAX_GRAPHICS_RATIO = float(os.getenv("FRAME_OCR_MAX_GRAPHICS_RATIO", "0.01"))
+# WebP thumbnails of analyzed keyframes, packed into sprite sheets for the timeline (see videos/thumbnails.py)
+FRAME_THUMBNAILS_ENABLED = os.getenv("FRAME_THUMBNAILS_ENABLED", "True").lower() in ("true", "1", "yes")
+FRAME_THUMBNAIL_WIDTH = int(os.getenv("FRAME_THUMBNAIL_WIDTH", "320"))
+FRAME_THUMBNAIL_QUALITY = int(os.getenv("FRAME_THUMBNAIL_QUALITY", "75"))
+SPRITE_TILE_WIDTH = int(os.getenv("SPRITE_TILE_WIDTH", "160"))
+
+# Chat history sent with each question: the newest CHAT_HISTORY_MAX_MESSAGES are loaded,
+# then trimmed (newest first) to the token budget when the prompt is built
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1500"))
+CHAT_HISTORY_MAX_MESSAGES = int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", "40"))
+# Retrieved video context included in each ask prompt (see videos/prompts.py)
+ASK_CONTEXT_TOKEN_BUDGET = int(os.getenv("ASK_CONTEXT_TOKEN_BUDGET", "3000"))
+
+# Sentence embedding model, and optionally a shared embedding server to use instead of
+# loading it in every process (run: python manage.py embedding_server)
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# Inference backend: "torch" (sentence-transformers) or "onnx" (ONNX Runtime, no torch needed;
+# export the model first, see videos/onnx_embeddings.py)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_PATH = os.getenv("EMBEDDING_ONNX_PATH", str(BASE_DIR / "onnx-model"))
+EMBEDDING_ONNX_QUANTIZED = os.getenv("EMBEDDING_ONNX_QUANTIZED", "True").lower() in ("true", "1", "yes")
+EMBEDDING_ONNX_THREADS = int(os.getenv("EMBEDDING_ONNX_THREADS", "0"))
+EMBEDDING_SERVER_SOCKET = os.getenv("EMBEDDING_SERVER_SOCKET", "")
+EMBEDDING_SERVER_TIMEOUT = float(os.getenv("EMBEDDING_SERVER_TIMEOUT", "30"))
+
+# Question embeddings cached across workers: SQLite file + per-process LRU (see videos/embedding_cache.py)
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "True").lower() in ("true", "1", "yes")
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", str(BASE_DIR / "cache" / "query_embeddings.sqlite3"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+EMBEDDING_CACHE_MEMORY_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "1024"))
+
+# YouTube captions replace Whisper transcription when usable (see videos/captions.py).
+# Languages are regexes tried in order; auto-generated captions are only used if enabled
+YOUTUBE_CAPTIONS_ENABLED = os.getenv("YOUTUBE_CAPTIONS_ENABLED", "True").lower() in ("true", "1", "yes")
+YOUTUBE_CAPTION_LANGUAGES = os.getenv("YOUTUBE_CAPTION_LANGUAGES", "en,en-.*").split(",")
+YOUTUBE_USE_AUTO_CAPTIONS = os.getenv("YOUTUBE_USE_AUTO_CAPTIONS", "False").lower() in ("true", "1", "yes")
+# Extracted YouTube info is cached per video ID and reused at download time. Format URLs
+# in it expire after a few hours; downloads re-extract if they have
+YOUTUBE_INFO_CACHE_TTL = int(os.getenv("YOUTUBE_INFO_CACHE_TTL", "1800"))
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # File-based so every gunicorn worker and ingest process shares it
+    "youtube": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv("YOUTUBE_INFO_CACHE_DIR", str(BASE_DIR / "cache" / "youtube")),
+        "TIMEOUT": YOUTUBE_INFO_CACHE_TTL,
+        "OPTIONS": {"MAX_ENTRIES": 1000},
+    },
+}
+
+# Concurrent question embeddings are encoded in micro-batches (see videos/embeddings.py):
+# a batch waits up to EMBED_BATCH_WAIT_MS for more requests, up to EMBED_BATCH_MAX_SIZE texts
+EMBED_BATCHING = os.getenv("EMBED_BATCHING", "True").lower() in ("true", "1", "yes")
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "2"))
+
+# Server-Timing headers + JSON log lines for instrumented requests (see karyon/timing.py).
+# Sample rate is the fraction of requests timed (0.0 - 1.0)
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "True").lower() in ("true", "1", "yes")
+SERVER_TIMING_SAMPLE_RATE = float(os.getenv("SERVER_TIMING_SAMPLE_RATE", "1.0"))
+
+# Prometheus metrics at /metrics (requires: pip install prometheus-client; see karyon/metrics.py).
+# If METRICS_TOKEN is set, scrapers must send it as a Bearer token
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "False").lower() in ("true", "1", "yes")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 # Production security settings
 if not DEBUG:
     SECURE_SSL_REDIRECT = False  # Railway handles SSL at the edge
@@ -171,4 +282,4 @@ if not DEBUG:
     CSRF_COOKIE_SECURE = True
     SECURE_HSTS_SECONDS = 31536000
     SECURE_HSTS_INCLUDE_SUBDOMAINS = True
-    SECURE_HSTS_PRELOAD = True
\ No newline at end of file
+    SECURE_HSTS_PRELOAD = True
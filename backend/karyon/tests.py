@@ -0,0 +1,123 @@
+import os
+import shutil
+import tempfile
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from .media import parse_range_header, serve_media
+
+class ParseRangeHeaderTests(SimpleTestCase):
+    def test_single_range(self):
+        self.assertEqual(parse_range_header('bytes=0-99', 1000), [(0, 99)])
+
+    def test_suffix_range(self):
+        self.assertEqual(parse_range_header('bytes=-500', 1000), [(500, 999)])
+        # Longer than the file: the whole file
+        self.assertEqual(parse_range_header('bytes=-5000', 1000), [(0, 999)])
+
+    def test_open_ended_range(self):
+        self.assertEqual(parse_range_header('bytes=900-', 1000), [(900, 999)])
+
+    def test_end_past_file_is_clamped(self):
+        self.assertEqual(parse_range_header('bytes=990-2000', 1000), [(990, 999)])
+
+    def test_overlapping_and_adjacent_ranges_are_merged(self):
+        self.assertEqual(parse_range_header('bytes=500-599,0-99,100-199,550-650', 1000), [(0, 199), (500, 650)])
+
+    def test_unsatisfiable(self):
+        self.assertEqual(parse_range_header('bytes=1000-', 1000), [])
+        self.assertEqual(parse_range_header('bytes=-0', 1000), [])
+
+    def test_ignored(self):
+        for header in (None, '', 'items=0-1', 'bytes=5-1', 'bytes=-', 'bytes=a-b',
+                       'bytes=' + ','.join(f'{i * 10}-{i * 10}' for i in range(20))):
+            with self.subTest(header=header):
+                self.assertIsNone(parse_range_header(header, 1000))
+
+class ServeMediaTests(SimpleTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        # Small blocks, so ranges are streamed in several reads
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, MEDIA_ACCEL_REDIRECT_PREFIX='',
+                                              MEDIA_STREAM_BLOCK_SIZE=7)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.content = bytes(range(256)) * 4
+        with open(os.path.join(self.media_root, 'clip.mp4'), 'wb') as f:
+            f.write(self.content)
+        self.factory = RequestFactory()
+
+    def get(self, **headers):
+        return serve_media(self.factory.get('/media/clip.mp4', headers=headers), 'clip.mp4')
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_file(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(self.body(response), self.content)
+
+    def test_single_range(self):
+        response = self.get(range='bytes=10-29')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-29/1024')
+        self.assertEqual(response['Content-Length'], '20')
+        self.assertEqual(self.body(response), self.content[10:30])
+
+    def test_suffix_range(self):
+        response = self.get(range='bytes=-100')
+        self.assertEqual(response['Content-Range'], 'bytes 924-1023/1024')
+        self.assertEqual(self.body(response), self.content[-100:])
+
+    def test_open_ended_range(self):
+        response = self.get(range='bytes=1000-')
+        self.assertEqual(response['Content-Range'], 'bytes 1000-1023/1024')
+        self.assertEqual(self.body(response), self.content[1000:])
+
+    def test_unsatisfiable_range(self):
+        response = self.get(range='bytes=2000-3000')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_multiple_ranges(self):
+        response = self.get(range='bytes=0-9,100-119')
+        self.assertEqual(response.status_code, 206)
+        content_type = response['Content-Type']
+        self.assertTrue(content_type.startswith('multipart/byteranges; boundary='))
+        boundary = content_type.split('boundary=')[1]
+
+        body = self.body(response)
+        self.assertEqual(response['Content-Length'], str(len(body)))
+        self.assertEqual(body, (
+            f'--{boundary}\r\nContent-Type: video/mp4\r\nContent-Range: bytes 0-9/1024\r\n\r\n'.encode()
+            + self.content[0:10]
+            + f'\r\n--{boundary}\r\nContent-Type: video/mp4\r\nContent-Range: bytes 100-119/1024\r\n\r\n'.encode()
+            + self.content[100:120]
+            + f'\r\n--{boundary}--\r\n'.encode()
+        ))
+
+    def test_if_range_current_etag(self):
+        etag = self.get()['ETag']
+        response = self.get(range='bytes=0-9', if_range=etag)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), self.content[:10])
+
+    def test_if_range_stale_etag_serves_full_file(self):
+        response = self.get(range='bytes=0-9', if_range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+
+    def test_if_none_match(self):
+        etag = self.get()['ETag']
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_head_has_no_body(self):
+        response = serve_media(self.factory.head('/media/clip.mp4', headers={'range': 'bytes=0-9'}), 'clip.mp4')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(self.body(response), b'')
@@ -0,0 +1,75 @@
+"""
+Lightweight request phase timing, reported as Server-Timing headers.
+
+Code wraps interesting phases in `span('name')`. While a sampled request is being
+handled the spans are collected in a context variable; ServerTimingMiddleware then
+adds them to the response, e.g.
+
+    Server-Timing: auth;dur=1.8, embed;dur=12.4, db;dur=3.1, llm;dur=842.0, total;dur=871.5
+
+and prints one JSON log line per instrumented request. Outside a sampled request
+span() only does a context variable lookup, so it is cheap to leave in place.
+"""
+import json
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+_spans = ContextVar('server_timing_spans', default=None)
+
+@contextmanager
+def span(name):
+    """Time the enclosed block as phase `name`; repeated phases add up."""
+    spans = _spans.get()
+    if spans is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans[name] = spans.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+class ServerTimingMiddleware:
+    """Collect span() timings for a sample of requests and report them."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.SERVER_TIMING_ENABLED or random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        spans = {}
+        token = _spans.set(spans)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _spans.reset(token)
+        total = (time.perf_counter() - start) * 1000
+
+        # Only report requests that were actually instrumented
+        if spans:
+            entries = [f"{name};dur={ms:.1f}" for name, ms in spans.items()]
+            entries.append(f"total;dur={total:.1f}")
+            response['Server-Timing'] = ', '.join(entries)
+            print(json.dumps({
+                'event': 'server_timing',
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'total_ms': round(total, 1),
+                'spans_ms': {name: round(ms, 1) for name, ms in spans.items()},
+            }))
+        return response
+
+class TimedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that reports its cost as the 'auth' span."""
+
+    def authenticate(self, request):
+        with span('auth'):
+            return super().authenticate(request)
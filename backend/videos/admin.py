@@ -1,5 +1,13 @@
 from django.contrib import admin
-from .models import Video, TranscriptChunk
+from .models import Video, TranscriptChunk, ProcessingMetric
+
+class ProcessingMetricInline(admin.TabularInline):
+    model = ProcessingMetric
+    extra = 0
+    can_delete = False
+    fields = ['stage', 'started_at', 'succeeded', 'wall_time', 'cpu_time', 'bytes_in', 'bytes_out',
+              'api_calls', 'tokens', 'frames_decoded', 'frames_kept']
+    readonly_fields = fields
 
 @admin.register(Video)
 class VideoAdmin(admin.ModelAdmin):
@@ -7,6 +15,15 @@ class VideoAdmin(admin.ModelAdmin):
     list_filter = ['status']
     search_fields = ['title']
     readonly_fields = ['created_at']
+    inlines = [ProcessingMetricInline]
+
+@admin.register(ProcessingMetric)
+class ProcessingMetricAdmin(admin.ModelAdmin):
+    list_display = ['video', 'stage', 'started_at', 'succeeded', 'wall_time', 'cpu_time',
+                    'api_calls', 'tokens', 'frames_decoded', 'frames_kept']
+    list_filter = ['stage', 'succeeded']
+    search_fields = ['video__title']
+    date_hierarchy = 'started_at'
 
 @admin.register(TranscriptChunk)
 class TranscriptChunkAdmin(admin.ModelAdmin):
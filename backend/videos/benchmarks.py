@@ -0,0 +1,332 @@
+"""
+Microbenchmarks for the ingest and retrieval hot paths.
+
+Everything runs offline on synthetic fixtures: generated transcript segments and
+embeddings, short generated videos (ffmpeg lavfi sources), the local OpenAI
+stand-in from `manage.py openai_standin` started in-process, and a deterministic
+stand-in for the sentence embedding model (StandinEncoder), so no model download
+is needed. Pass real_embeddings=True (`--real-embeddings`) to time the configured
+model instead. Run with `python manage.py benchmark`.
+"""
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from types import SimpleNamespace
+import numpy as np
+
+WORDS = (
+    "gradient descent loss function weights bias neuron layer matrix vector derivative "
+    "integral limit proof theorem lemma pointer array list tree graph node edge cache "
+    "memory thread process kernel energy force mass velocity cell protein enzyme"
+).split()
+
+def make_segments(count=600, seed=0, seconds_per_segment=5.0):
+    """Whisper-style segments that drift between a few topics."""
+    rng = random.Random(seed)
+    segments = []
+    start = 0.0
+    for idx in range(count):
+        # Switch topic every 15 segments
+        topic_start = (idx // 15) * 5 % (len(WORDS) - 8)
+        topic = WORDS[topic_start:topic_start + 8]
+        text = ' '.join(rng.choice(topic) for _ in range(rng.randint(8, 20)))
+        duration = seconds_per_segment * rng.uniform(0.6, 1.4)
+        segments.append({'text': text, 'start': start, 'end': start + duration})
+        start += duration
+    return segments
+
+def make_embeddings(count=2000, dim=384, seed=0):
+    """Unit-length random vectors shaped like all-MiniLM-L6-v2 output."""
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def make_video(path, seconds=60, size='640x360', rate=25):
+    """
+    Generate a short test video with a scene change every few seconds and a tone
+    as the audio track. Requires ffmpeg on PATH.
+    """
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f'testsrc2=size={size}:rate={rate}:duration={seconds}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+        '-vf', "hue=h=t*36",
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p',
+        '-c:a', 'aac', '-shortest', path
+    ], check=True, capture_output=True)
+    return path
+
+def start_openai_standin():
+    """Run the OpenAI stand-in on a free localhost port in a daemon thread; returns (server, base_url)."""
+    from http.server import ThreadingHTTPServer
+    from .management.commands.openai_standin import StandinHandler
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandinHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/v1'
+
+class StandinEncoder:
+    """
+    Offline replacement for the sentence embedding model, with the same encode()
+    interface: hashed bag-of-words vectors, unit length and shaped like
+    all-MiniLM-L6-v2 output. Deterministic, so results don't depend on a download;
+    the cases then time the code around the model (chunking, scoring, batching).
+    """
+
+    dim = 384
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, **kwargs):
+        single = isinstance(texts, str)
+        rows = np.zeros((1 if single else len(texts), self.dim), dtype=np.float32)
+        for row, text in zip(rows, [texts] if single else texts):
+            for word in text.lower().split():
+                row[zlib.crc32(word.encode()) % self.dim] += 1.0
+            norm = np.linalg.norm(row)
+            if norm:
+                row /= norm
+        return rows[0] if single else rows
+
+@contextmanager
+def benchmark_embeddings(real=False):
+    """
+    Swap in StandinEncoder (unless `real`) and bypass the embedding server and the
+    query cache, so every case embeds in-process on every run.
+    """
+    from . import embeddings
+
+    saved = embeddings._model, embeddings._server_client, embeddings._query_cache
+    if not real:
+        embeddings._model = StandinEncoder()
+    embeddings._server_client = None
+    embeddings._query_cache = None
+    try:
+        yield
+    finally:
+        embeddings._model, embeddings._server_client, embeddings._query_cache = saved
+
+class Benchmark:
+    """A named case: setup() builds fixtures once, run(fixture) is the timed body, teardown(fixture) cleans up."""
+
+    def __init__(self, name, run, setup=None, teardown=None, repeat=10, requires_ffmpeg=False):
+        self.name = name
+        self.run = run
+        self.setup = setup or (lambda workdir: None)
+        self.teardown = teardown or (lambda fixture: None)
+        self.repeat = repeat
+        self.requires_ffmpeg = requires_ffmpeg
+
+# --- Cases ---------------------------------------------------------------
+
+def _bench_chunk_transcript(segments):
+    from .utils import chunk_transcript
+    chunk_transcript(segments)
+
+def _setup_find_relevant(workdir):
+    vectors = make_embeddings(2000)
+    items = [SimpleNamespace(embedding=v.tolist()) for v in vectors]
+    return items, make_embeddings(1, seed=1)[0]
+
+def _bench_find_relevant(fixture):
+    from .utils import _find_relevant
+    items, question = fixture
+    _find_relevant(items, lambda item: item.embedding, question, max_distance=1.5)
+
+def _bench_find_best_segment(chunk):
+    from .embeddings import find_best_segment
+    find_best_segment(chunk, "how does gradient descent update the weights")
+
+def _bench_embed_text_concurrent(pool):
+    from .embeddings import embed_text
+    questions = [f"what does the lecture say about {word}" for word in WORDS[:32]]
+    list(pool.map(embed_text, questions))
+
+def _setup_thread_pool(workdir):
+    from concurrent.futures import ThreadPoolExecutor
+    return ThreadPoolExecutor(max_workers=16)
+
+def _bench_extract_keyframes(video_path):
+    from .vision_utils import extract_keyframes
+    extract_keyframes(video_path, min_interval=10.0)
+
+def _bench_extract_audio(fixture):
+    from .utils import extract_audio
+    video_path, output_dir = fixture
+    extract_audio(video_path, output_dir=output_dir)
+
+def _bench_demux_scan(fixture):
+    from .demux import scan_media
+    video_path, audio_path = fixture
+    scan_media(video_path, audio_path, scan_fps=2.0)
+
+def _setup_demux_frames(workdir):
+    from .demux import scan_media
+    video_path = _setup_video(workdir)
+    return video_path, scan_media(video_path, scan_fps=2.0)['timestamps']
+
+def _bench_demux_grab_frames(fixture):
+    from .demux import grab_frames
+    video_path, timestamps = fixture
+    grab_frames(video_path, timestamps)
+
+def _setup_serve_media(workdir):
+    from django.test import RequestFactory
+    media_root = os.path.join(workdir, 'media')
+    os.makedirs(media_root, exist_ok=True)
+    with open(os.path.join(media_root, 'sample.mp4'), 'wb') as f:
+        f.write(os.urandom(64 * 1024 * 1024))
+    return media_root, RequestFactory()
+
+def _bench_serve_media(fixture):
+    from django.test import override_settings
+    from karyon.media import serve_media
+
+    media_root, factory = fixture
+    with override_settings(MEDIA_ROOT=media_root):
+        # Typical player pattern: open-ended first request, then seeks
+        for header in ('bytes=0-', 'bytes=33554432-', 'bytes=60000000-60999999'):
+            response = serve_media(factory.get('/media/sample.mp4', HTTP_RANGE=header), 'sample.mp4')
+            for _ in response.streaming_content:
+                pass
+
+def _setup_serializer(workdir):
+    from .models import Video
+    transcript = make_segments(300)
+    return [
+        Video(id=idx, title=f'Lecture {idx}', file=f'videos/lecture_{idx}.mp4', status='ready',
+              processing_mode='both', transcript_data=transcript)
+        for idx in range(100)
+    ]
+
+def _bench_serializer(videos):
+    from .serializers import VideoSerializer
+    VideoSerializer(videos, many=True).data
+
+def _setup_openai_roundtrip(workdir):
+    from django.test import override_settings
+    server, base_url = start_openai_standin()
+    override = override_settings(OPENAI_BASE_URL=base_url, OPENAI_API_KEY='sk-benchmark')
+    override.enable()
+    return server, override
+
+def _teardown_openai_roundtrip(fixture):
+    server, override = fixture
+    override.disable()
+    server.shutdown()
+
+def _bench_openai_roundtrip(fixture):
+    from .llm import get_openai_client
+    client = get_openai_client('sk-benchmark')
+    for _ in range(10):
+        client.chat.completions.create(model='gpt-4o', messages=[{'role': 'user', 'content': 'hi'}], max_tokens=10)
+
+def _setup_video(workdir):
+    return make_video(os.path.join(workdir, 'synthetic.mp4'), seconds=60)
+
+def _setup_video_and_outdir(workdir):
+    return _setup_video(workdir), os.path.join(workdir, 'audio')
+
+def _setup_video_and_audio_path(workdir):
+    return _setup_video(workdir), os.path.join(workdir, 'demux.mp3')
+
+def _setup_best_segment_chunk(workdir):
+    return SimpleNamespace(segments=make_segments(18))
+
+BENCHMARKS = [
+    Benchmark('chunk_transcript', _bench_chunk_transcript, setup=lambda workdir: make_segments(600), repeat=5),
+    Benchmark('find_relevant', _bench_find_relevant, setup=_setup_find_relevant, repeat=20),
+    Benchmark('find_best_segment', _bench_find_best_segment, setup=_setup_best_segment_chunk, repeat=20),
+    Benchmark('embed_text_concurrent', _bench_embed_text_concurrent, setup=_setup_thread_pool,
+              teardown=lambda pool: pool.shutdown(), repeat=10),
+    Benchmark('extract_keyframes', _bench_extract_keyframes, setup=_setup_video, repeat=3, requires_ffmpeg=True),
+    Benchmark('extract_audio', _bench_extract_audio, setup=_setup_video_and_outdir, repeat=3, requires_ffmpeg=True),
+    # Single-pass ingest path (videos/demux.py): audio + scan stream, then full-res frames at keyframes
+    Benchmark('demux_scan_media', _bench_demux_scan, setup=_setup_video_and_audio_path, repeat=3, requires_ffmpeg=True),
+    Benchmark('demux_grab_frames', _bench_demux_grab_frames, setup=_setup_demux_frames, repeat=3,
+              requires_ffmpeg=True),
+    Benchmark('serve_media_ranges', _bench_serve_media, setup=_setup_serve_media, repeat=5),
+    Benchmark('video_serializer_list', _bench_serializer, setup=_setup_serializer, repeat=10),
+    Benchmark('openai_roundtrip_standin', _bench_openai_roundtrip, setup=_setup_openai_roundtrip,
+              teardown=_teardown_openai_roundtrip, repeat=5),
+]
+
+# --- Runner --------------------------------------------------------------
+
+def run_benchmarks(names=None, repeat=None, log=print, real_embeddings=False):
+    """
+    Run benchmark cases and return a JSON-serializable report.
+
+    Args:
+        names: Optional list of case names to run (default: all)
+        repeat: Override the per-case repeat count
+        log: Callable for progress lines
+        real_embeddings: Time the configured embedding model instead of StandinEncoder
+
+    Returns:
+        {'meta': {...}, 'results': {name: {min_ms, median_ms, mean_ms, p95_ms, runs}}}
+    """
+    has_ffmpeg = shutil.which('ffmpeg') is not None and shutil.which('ffprobe') is not None
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='karyon-bench-') as workdir, benchmark_embeddings(real=real_embeddings):
+        for bench in BENCHMARKS:
+            if names and bench.name not in names:
+                continue
+            if bench.requires_ffmpeg and not has_ffmpeg:
+                log(f"{bench.name}: skipped (ffmpeg/ffprobe not found)")
+                continue
+
+            fixture = bench.setup(workdir)
+            try:
+                bench.run(fixture)  # Warm-up: model loads, imports, page cache
+
+                timings = []
+                for _ in range(repeat or bench.repeat):
+                    start = time.perf_counter()
+                    bench.run(fixture)
+                    timings.append((time.perf_counter() - start) * 1000)
+            finally:
+                bench.teardown(fixture)
+
+            timings.sort()
+            results[bench.name] = {
+                'min_ms': round(timings[0], 3),
+                'median_ms': round(statistics.median(timings), 3),
+                'mean_ms': round(statistics.fmean(timings), 3),
+                'p95_ms': round(timings[min(int(len(timings) * 0.95), len(timings) - 1)], 3),
+                'runs': len(timings),
+            }
+            log(f"{bench.name}: median {results[bench.name]['median_ms']:.2f} ms over {len(timings)} runs")
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'embeddings': 'real' if real_embeddings else 'standin',
+        },
+        'results': results,
+    }
+
+def compare_to_baseline(report, baseline, threshold=0.2):
+    """
+    Compare median timings against a baseline report.
+
+    Returns:
+        List of (name, baseline_ms, current_ms, ratio, regressed) for cases present in both
+    """
+    rows = []
+    for name, current in report['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            continue
+        ratio = current['median_ms'] / previous['median_ms'] if previous['median_ms'] else 1.0
+        rows.append((name, previous['median_ms'], current['median_ms'], ratio, ratio > 1 + threshold))
+    return rows
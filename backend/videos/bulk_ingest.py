@@ -0,0 +1,169 @@
+"""
+Bulk ingest of local video files (used by `manage.py ingest_directory`).
+
+Files are identified by the SHA-256 of their content, so a rerun skips files that
+are already ready and retries ones that failed or were interrupted. Processing runs
+in a pool of worker processes, each running the normal process_video pipeline.
+"""
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import connections
+
+VIDEO_EXTENSIONS = {'.mp4', '.mov', '.avi', '.mkv', '.webm', '.flv', '.wmv', '.m4v'}
+
+def hash_file(path, block_size=1024 * 1024):
+    """SHA-256 hex digest of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def discover_files(directory=None, manifest=None):
+    """
+    List video files to ingest, sorted.
+
+    Args:
+        directory: Directory searched recursively for video files
+        manifest: Text file with one video path per line ('#' starts a comment);
+                  relative paths are resolved against the manifest's directory
+    """
+    paths = set()
+    if directory:
+        for root, _, names in os.walk(directory):
+            for name in names:
+                if os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS:
+                    paths.add(os.path.abspath(os.path.join(root, name)))
+    if manifest:
+        base = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest) as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    paths.add(os.path.abspath(os.path.join(base, line)))
+    return sorted(paths)
+
+def _store_file(path, digest, user):
+    """
+    Return the file's name relative to MEDIA_ROOT, copying it under videos/ if it lives
+    elsewhere and the user doesn't store a file with the same content yet.
+    """
+    from .storage import find_stored_blob
+
+    media_root = os.path.abspath(settings.MEDIA_ROOT)
+    if os.path.commonpath([media_root, path]) == media_root:
+        return os.path.relpath(path, media_root)
+    stored = find_stored_blob(digest, user)
+    if stored:
+        return stored
+    with open(path, 'rb') as f:
+        return default_storage.save(os.path.join('videos', os.path.basename(path)), File(f))
+
+def register_videos(paths, user, processing_mode, transcription_backend='', log=print):
+    """
+    Create Video rows for new files in one bulk INSERT, and reset unfinished ones.
+    New files that would put the user over STORAGE_USER_QUOTA_MB are skipped (and not copied).
+
+    Returns:
+        (video_ids to process, number of files skipped as already ingested,
+         number of files skipped as over the quota)
+    """
+    from .models import Video
+    from .persistence import clear_results
+    from .storage import QuotaExceeded, check_quota
+
+    hashes = {}
+    for path in paths:
+        hashes[path] = hash_file(path)
+    existing = {v.content_hash: v for v in Video.objects.filter(user=user, content_hash__in=set(hashes.values()))}
+
+    video_ids = []
+    new_videos = []
+    skipped = 0
+    over_quota = 0
+    # Size of the new files so far; their rows are only inserted at the end
+    pending_bytes = 0
+    seen = set()
+    for path, digest in hashes.items():
+        if digest in seen:
+            log(f"Skipping {path}: same content as another file in this run")
+            skipped += 1
+            continue
+        seen.add(digest)
+
+        video = existing.get(digest)
+        if video is not None and video.status == 'ready':
+            skipped += 1
+        elif video is not None:
+            # Failed or interrupted in an earlier run: start over from a clean state
+            clear_results(video)
+            video_ids.append(video.id)
+        else:
+            file_size = os.path.getsize(path)
+            try:
+                check_quota(user, file_size, pending_bytes=pending_bytes)
+            except QuotaExceeded as e:
+                log(f"Skipping {path}: {str(e)}")
+                over_quota += 1
+                continue
+            pending_bytes += file_size
+            new_videos.append(Video(
+                user=user,
+                title=os.path.splitext(os.path.basename(path))[0][:200],
+                file=_store_file(path, digest, user),
+                file_size=file_size,
+                processing_mode=processing_mode,
+                transcription_backend=transcription_backend,
+                content_hash=digest,
+            ))
+
+    created = Video.objects.bulk_create(new_videos)
+    video_ids.extend(video.id for video in created)
+    return video_ids, skipped, over_quota
+
+def _init_worker(threads):
+    # Keep each worker's torch/BLAS threads within its share of the CPUs
+    for name in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[name] = str(threads)
+    import django
+    django.setup()
+
+def _process_one(video_id, openai_key):
+    from .models import Video
+    from .tasks import process_video
+
+    start = time.perf_counter()
+    process_video(video_id, openai_key=openai_key)
+    video = Video.objects.only('title', 'status', 'error_message').get(id=video_id)
+    return video_id, video.title, video.status, video.error_message, time.perf_counter() - start
+
+def process_videos(video_ids, openai_key=None, workers=2, threads_per_worker=1, log=print):
+    """
+    Run process_video for each id across a pool of worker processes.
+
+    Returns:
+        List of (video_id, title, status, error_message, seconds), in completion order
+    """
+    # Workers are spawned fresh, and must not share the parent's DB connections
+    connections.close_all()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(threads_per_worker,)) as pool:
+        futures = {pool.submit(_process_one, video_id, openai_key): video_id for video_id in video_ids}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker process itself died (e.g. out of memory)
+                result = (futures[future], '', 'failed', str(e) or type(e).__name__, 0.0)
+            results.append(result)
+            video_id, title, status, error, seconds = result
+            log(f"[{len(results)}/{len(video_ids)}] {title or video_id}: {status} in {seconds:.1f}s"
+                + (f" ({error})" if error else ""))
+    return results
@@ -0,0 +1,156 @@
+"""
+Caption parsing: turns SRT, WebVTT and YouTube json3 caption tracks into the
+Whisper-style segments ({'id', 'start', 'end', 'text'}) that chunk_transcript and
+find_best_segment expect, so videos with usable captions skip audio extraction
+and transcription.
+
+Everything here works on plain text/files and has no network or Django access.
+"""
+import html
+import json
+import os
+import re
+
+CAPTION_EXTENSIONS = ['srt', 'vtt', 'json3']
+
+# Preferred formats when picking a YouTube caption track
+YOUTUBE_FORMAT_PREFERENCE = ['json3', 'vtt', 'srt']
+
+_TIMING_RE = re.compile(
+    r'(?P<start>(?:\d+:)?\d{1,2}:\d{2}[.,]\d{1,3})\s*-->\s*(?P<end>(?:\d+:)?\d{1,2}:\d{2}[.,]\d{1,3})'
+)
+_TAG_RE = re.compile(r'<[^>]*>')
+
+def _parse_timestamp(value):
+    """'01:02:03,456', '02:03.456' -> seconds."""
+    parts = value.replace(',', '.').split(':')
+    seconds = float(parts[-1])
+    if len(parts) > 1:
+        seconds += int(parts[-2]) * 60
+    if len(parts) > 2:
+        seconds += int(parts[-3]) * 3600
+    return seconds
+
+def _clean_line(line):
+    """Strip styling/karaoke tags and entities from a cue line."""
+    return ' '.join(html.unescape(_TAG_RE.sub('', line)).split())
+
+def _parse_cues(text):
+    """
+    Parse SRT or WebVTT cue blocks.
+
+    Rolling captions (as in YouTube's auto-generated VTT) repeat the previous line
+    at the top of each cue; lines already shown in the previous cue are dropped.
+    """
+    segments = []
+    previous_lines = set()
+    for block in re.split(r'\n\s*\n', text.replace('\r\n', '\n').replace('\r', '\n')):
+        lines = block.strip().split('\n')
+        for idx, line in enumerate(lines):
+            match = _TIMING_RE.search(line)
+            if match:
+                break
+        else:
+            continue  # Header, NOTE, STYLE or malformed block
+
+        cue_lines = [cleaned for cleaned in (_clean_line(line) for line in lines[idx + 1:]) if cleaned]
+        new_lines = [line for line in cue_lines if line not in previous_lines]
+        previous_lines = set(cue_lines)
+        if not new_lines:
+            continue
+
+        segments.append({
+            'start': _parse_timestamp(match.group('start')),
+            'end': _parse_timestamp(match.group('end')),
+            'text': ' '.join(new_lines),
+        })
+    return segments
+
+def _parse_json3(text):
+    """Parse YouTube's json3 caption format."""
+    segments = []
+    for event in json.loads(text).get('events', []):
+        if 'segs' not in event or 'tStartMs' not in event:
+            continue
+        line = ' '.join(''.join(seg.get('utf8', '') for seg in event['segs']).split())
+        if not line:
+            continue  # Line-break ("aAppend") and empty events
+        start = event['tStartMs'] / 1000
+        segments.append({
+            'start': start,
+            'end': start + event.get('dDurationMs', 0) / 1000,
+            'text': html.unescape(line),
+        })
+    return segments
+
+def parse_captions(text, fmt):
+    """
+    Parse caption text into transcript segments.
+
+    Args:
+        text: Caption file contents
+        fmt: 'srt', 'vtt' or 'json3'
+
+    Returns:
+        List of {'id', 'start', 'end', 'text'} dicts, ordered by start time
+    """
+    if fmt == 'json3':
+        segments = _parse_json3(text)
+    elif fmt in ('srt', 'vtt'):
+        segments = _parse_cues(text)
+    else:
+        raise ValueError(f"Unsupported caption format: {fmt}")
+
+    segments.sort(key=lambda seg: seg['start'])
+    # Auto captions overlap (a line stays up while the next one appears); end each at the next start
+    for seg, following in zip(segments, segments[1:]):
+        if following['start'] > seg['start']:
+            seg['end'] = min(seg['end'], following['start'])
+    for idx, seg in enumerate(segments):
+        seg['id'] = idx
+        seg['end'] = max(seg['end'], seg['start'])
+    return segments
+
+def parse_caption_file(path):
+    """Parse an .srt, .vtt or .json3 file into transcript segments."""
+    fmt = os.path.splitext(path)[1].lstrip('.').lower()
+    with open(path, encoding='utf-8-sig', errors='replace') as f:
+        return parse_captions(f.read(), fmt)
+
+def captions_usable(segments, duration=None, min_words=20, min_coverage=0.5):
+    """
+    Whether captions are good enough to replace transcription: enough words and,
+    if the media duration is known, covering at least `min_coverage` of it.
+    """
+    if not segments:
+        return False
+    if sum(len(seg['text'].split()) for seg in segments) < min_words:
+        return False
+    if duration:
+        return segments[-1]['end'] >= duration * min_coverage
+    return True
+
+def pick_caption_track(info, languages, use_auto=False):
+    """
+    Choose a caption track from a yt-dlp info dict.
+
+    Uploaded subtitles are preferred over automatic captions, then earlier entries
+    in `languages` (regexes like 'en.*'), then the format order in YOUTUBE_FORMAT_PREFERENCE.
+
+    Returns:
+        {'url', 'ext', 'language', 'automatic'} or None
+    """
+    sources = [(info.get('subtitles') or {}, False)]
+    if use_auto:
+        sources.append((info.get('automatic_captions') or {}, True))
+
+    for tracks_by_language, automatic in sources:
+        for pattern in languages:
+            for language, tracks in tracks_by_language.items():
+                if not re.fullmatch(pattern, language):
+                    continue
+                for ext in YOUTUBE_FORMAT_PREFERENCE:
+                    track = next((t for t in tracks if t.get('ext') == ext and t.get('url')), None)
+                    if track:
+                        return {'url': track['url'], 'ext': ext, 'language': language, 'automatic': automatic}
+    return None
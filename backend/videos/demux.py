@@ -0,0 +1,144 @@
+"""
+Single-pass demux for videos processed in 'both' or 'visual' mode.
+
+extract_audio (pydub) and extract_keyframes (OpenCV) each read and decode the whole
+file. Here one ffmpeg process reads it once and writes both outputs:
+- the speech audio as a 32 kbps MP3, like extract_audio, and
+- a low-rate 320x180 grayscale frame stream on stdout, scanned for visual changes.
+
+Only the frames chosen as keyframes are then decoded at full resolution, with a
+seek to each timestamp, instead of converting every frame of a 1080p upload.
+"""
+import subprocess
+import tempfile
+from io import BytesIO
+import numpy as np
+from PIL import Image
+from .pipeline_metrics import record
+from .renditions import probe_media
+
+# Resolution of the change-detection stream (same as extract_keyframes compares at)
+SCAN_WIDTH, SCAN_HEIGHT = 320, 180
+
+# Gray levels (0-255) a pixel must move by to count as changed. Compression and sensor
+# noise stays within a few levels at 320x180 but alters most pixels between frames, so
+# counting any difference would fire on every static slide.
+SCAN_PIXEL_TOLERANCE = 8
+
+# Percent of pixels that must change since the last keyframe. Past the noise, a slide
+# that only adds a couple of bullet lines changes about 5-10% of the frame.
+SCAN_THRESHOLD = 5.0
+
+def percent_changed(frame, reference, pixel_tolerance=SCAN_PIXEL_TOLERANCE):
+    """Percent of pixels in a grayscale frame more than `pixel_tolerance` gray levels away from `reference`."""
+    changed = np.abs(frame.astype(np.int16) - reference) > pixel_tolerance
+    return np.count_nonzero(changed) / frame.size * 100
+
+def detect_changes(frames, fps, threshold=SCAN_THRESHOLD, min_interval=10.0, pixel_tolerance=SCAN_PIXEL_TOLERANCE):
+    """
+    Pick keyframe timestamps from a stream of grayscale frames: the first frame, then
+    any frame at least `min_interval` seconds after the last keyframe where over
+    `threshold` percent of pixels differ from the last keyframe (see percent_changed).
+
+    Comparing against the last keyframe rather than the previous frame means a slide
+    change inside `min_interval` is still picked up once the interval has passed, and
+    gradual changes add up. extract_keyframes applies the same rule at the native
+    frame rate, so both paths pick the same slides.
+
+    Args:
+        frames: Iterable of 2-D uint8 arrays, sampled at `fps`
+
+    Returns:
+        (timestamps, number of frames scanned)
+    """
+    timestamps = []
+    reference = None  # Frame at the last keyframe
+    prev_keyframe_time = -min_interval
+    count = 0
+    for idx, frame in enumerate(frames):
+        count += 1
+        timestamp = idx / fps
+        if reference is None:
+            capture = True
+        elif timestamp - prev_keyframe_time >= min_interval:
+            capture = percent_changed(frame, reference, pixel_tolerance) > threshold
+        else:
+            capture = False
+        if capture:
+            timestamps.append(timestamp)
+            prev_keyframe_time = timestamp
+            reference = frame
+    return timestamps, count
+
+def scan_media(video_path, audio_path=None, scan_fps=2.0, threshold=SCAN_THRESHOLD, min_interval=10.0):
+    """
+    Decode a video once: write its audio to `audio_path` (if given and the file has
+    audio) while picking keyframe timestamps from a low-resolution frame stream.
+
+    Returns:
+        Dict with audio_path (None if no audio was written), timestamps and frames_scanned
+    """
+    probe = probe_media(video_path)
+    write_audio = bool(audio_path and probe['audio'])
+    if not write_audio and not probe['video']:
+        return {'audio_path': None, 'timestamps': [], 'frames_scanned': 0}
+
+    args = ['ffmpeg', '-y', '-v', 'error', '-i', video_path]
+    if write_audio:
+        args += ['-map', '0:a:0', '-vn', '-c:a', 'libmp3lame', '-b:a', '32k', audio_path]
+    if probe['video']:
+        args += ['-map', '0:v:0', '-an', '-vf',
+                 f'fps={scan_fps},scale={SCAN_WIDTH}:{SCAN_HEIGHT},format=gray',
+                 '-f', 'rawvideo', 'pipe:1']
+
+    frame_size = SCAN_WIDTH * SCAN_HEIGHT
+    # stderr goes to a file so a chatty ffmpeg can never block on a full pipe
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=stderr)
+
+        def frames():
+            while True:
+                data = process.stdout.read(frame_size)
+                if len(data) < frame_size:
+                    return
+                yield np.frombuffer(data, dtype=np.uint8).reshape(SCAN_HEIGHT, SCAN_WIDTH)
+
+        try:
+            timestamps, scanned = detect_changes(frames(), scan_fps, threshold, min_interval)
+        finally:
+            process.stdout.close()
+            returncode = process.wait()
+        if returncode != 0:
+            stderr.seek(0)
+            raise RuntimeError(f"ffmpeg failed: {stderr.read().decode(errors='replace').strip()[-500:]}")
+
+    record(frames_decoded=scanned, frames_kept=len(timestamps))
+    return {
+        'audio_path': audio_path if write_audio else None,
+        'timestamps': timestamps,
+        'frames_scanned': scanned,
+    }
+
+def grab_frames(video_path, timestamps):
+    """
+    Decode full-resolution frames at the given timestamps.
+
+    Returns:
+        List of (timestamp, JPEG bytes) tuples, like extract_keyframes
+    """
+    keyframes = []
+    for timestamp in timestamps:
+        # Seeking before -i jumps to the nearest keyframe, then decodes up to the timestamp
+        result = subprocess.run(
+            ['ffmpeg', '-v', 'error', '-ss', f'{timestamp:.3f}', '-i', video_path,
+             '-frames:v', '1', '-f', 'image2pipe', '-c:v', 'png', 'pipe:1'],
+            capture_output=True,
+        )
+        if result.returncode != 0 or not result.stdout:
+            print(f"Could not decode frame at {timestamp:.1f}s: {result.stderr.decode(errors='replace').strip()[-200:]}")
+            continue
+        # Re-encoded like extract_keyframes so downstream OCR/vision see the same JPEGs
+        buffered = BytesIO()
+        Image.open(BytesIO(result.stdout)).convert('RGB').save(buffered, format="JPEG", quality=85)
+        keyframes.append((timestamp, buffered.getvalue()))
+    return keyframes
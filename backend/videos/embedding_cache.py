@@ -0,0 +1,128 @@
+"""
+Cache of question embeddings, shared by all processes on the machine.
+
+Common questions ("summarize this", "what is the main idea") are asked across many
+videos; cached vectors let embed_text skip the forward pass for them. Lookups check
+an in-memory LRU first, then a SQLite file every worker opens (WAL mode, so readers
+don't block each other). The SQLite store is bounded: once it grows past
+`max_entries`, the least recently used rows are deleted.
+
+Keys are a hash of the model version plus the normalized question (whitespace
+collapsed), so switching model or backend never returns stale vectors. Case is kept:
+a cased model embeds "Apple" and "apple" differently.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from karyon.metrics import cache_lookup
+
+# Check the on-disk size bound every this many inserts
+EVICT_EVERY = 100
+
+def normalize_question(text):
+    """Collapse whitespace, which tokenizers ignore; case is kept."""
+    return ' '.join(text.split())
+
+class QueryEmbeddingCache:
+    """
+    Two-level cache from normalized question text to its embedding.
+
+    Args:
+        path: SQLite file shared across processes
+        model_version: Identifies the model/backend producing the vectors
+        max_entries: Bound on rows kept on disk
+        memory_entries: Bound on vectors kept in this process
+    """
+
+    def __init__(self, path, model_version, max_entries=100000, memory_entries=1024):
+        self.path = path
+        self.model_version = model_version
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._memory_lock = threading.Lock()
+        self._local = threading.local()
+        self._inserts = 0
+
+    def _key(self, normalized):
+        return hashlib.sha256(f"{self.model_version}\n{normalized}".encode()).hexdigest()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS query_embeddings '
+                '(key TEXT PRIMARY KEY, embedding BLOB NOT NULL, last_used REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS query_embeddings_last_used ON query_embeddings (last_used)')
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, key, embedding):
+        with self._memory_lock:
+            self._memory[key] = embedding
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, normalized):
+        """Return the cached embedding (float32 array) for a normalized question, or None."""
+        key = self._key(normalized)
+        with self._memory_lock:
+            embedding = self._memory.get(key)
+            if embedding is not None:
+                self._memory.move_to_end(key)
+        cache_lookup('query_embedding_memory', embedding is not None)
+        if embedding is not None:
+            return embedding
+
+        try:
+            conn = self._connection()
+            row = conn.execute('SELECT embedding FROM query_embeddings WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                conn.execute('UPDATE query_embeddings SET last_used = ? WHERE key = ?', (time.time(), key))
+        except sqlite3.Error as e:
+            # The cache is an optimization; a locked or broken file just means a miss
+            print(f"Query embedding cache read failed: {str(e)}")
+            row = None
+        cache_lookup('query_embedding_disk', row is not None)
+        if row is None:
+            return None
+
+        embedding = np.frombuffer(row[0], dtype=np.float32)
+        self._remember(key, embedding)
+        return embedding
+
+    def put(self, normalized, embedding):
+        """Store the embedding for a normalized question in memory and on disk."""
+        key = self._key(normalized)
+        embedding = np.asarray(embedding, dtype=np.float32)
+        self._remember(key, embedding)
+        try:
+            conn = self._connection()
+            conn.execute(
+                'INSERT OR REPLACE INTO query_embeddings (key, embedding, last_used) VALUES (?, ?, ?)',
+                (key, embedding.tobytes(), time.time()),
+            )
+            self._inserts += 1
+            if self._inserts % EVICT_EVERY == 0:
+                self._evict(conn)
+        except sqlite3.Error as e:
+            print(f"Query embedding cache write failed: {str(e)}")
+
+    def _evict(self, conn):
+        (count,) = conn.execute('SELECT COUNT(*) FROM query_embeddings').fetchone()
+        if count > self.max_entries:
+            conn.execute(
+                'DELETE FROM query_embeddings WHERE key IN '
+                '(SELECT key FROM query_embeddings ORDER BY last_used LIMIT ?)',
+                (count - self.max_entries,),
+            )
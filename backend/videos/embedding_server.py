@@ -0,0 +1,138 @@
+"""
+Shared embedding server over a Unix socket.
+
+One process (`python manage.py embedding_server`) holds the SentenceTransformer model;
+web workers and ingest threads send it texts instead of each loading torch and the
+model themselves. Enable the client side with EMBEDDING_SERVER_SOCKET; if the server
+is unreachable, videos.embeddings falls back to in-process inference.
+
+Wire format, both directions: a 4-byte big-endian length followed by a JSON header.
+Requests are {"texts": [...], "batch_size": n}. Responses are {"shape": [rows, dim]}
+followed by the float32 embeddings as raw bytes, or {"error": "..."}.
+"""
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+import numpy as np
+
+_LENGTH = struct.Struct('!I')
+
+# After a failed request, don't try the server again for this many seconds
+RETRY_INTERVAL = 30.0
+
+class EmbeddingServerError(RuntimeError):
+    """The server was reached but failed to encode (it replied with an error frame)."""
+
+def _recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        packet = sock.recv(size - len(data))
+        if not packet:
+            raise ConnectionError("Embedding server closed the connection")
+        data.extend(packet)
+    return data
+
+def _send_message(sock, header, payload=b''):
+    body = json.dumps(header).encode()
+    sock.sendall(_LENGTH.pack(len(body)) + body + payload)
+
+def _recv_header(sock):
+    (length,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+    return json.loads(_recv_exact(sock, length))
+
+class EmbeddingClient:
+    """
+    Client for the embedding server. Each thread keeps its own persistent connection.
+    """
+
+    def __init__(self, socket_path, timeout=30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._unavailable_until = 0.0
+
+    @property
+    def available(self):
+        return time.monotonic() >= self._unavailable_until
+
+    def _connection(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def encode(self, texts, batch_size=32):
+        """
+        Embed a list of texts on the server.
+
+        Returns:
+            float32 array of shape (len(texts), dim)
+
+        Raises:
+            OSError / ConnectionError if the server can't be reached, EmbeddingServerError
+            if it failed to encode. The caller decides whether to fall back.
+        """
+        try:
+            sock = self._connection()
+            _send_message(sock, {'texts': list(texts), 'batch_size': batch_size})
+            header = _recv_header(sock)
+            if 'error' in header:
+                raise EmbeddingServerError(f"Embedding server error: {header['error']}")
+            rows, dim = header['shape']
+            data = _recv_exact(sock, rows * dim * 4)
+        except (OSError, ConnectionError):
+            self._close()
+            self._unavailable_until = time.monotonic() + RETRY_INTERVAL
+            raise
+        return np.frombuffer(data, dtype=np.float32).reshape(rows, dim)
+
+class _EncodeHandler(socketserver.StreamRequestHandler):
+    """Serves encode requests on one client connection until it closes."""
+
+    def handle(self):
+        from .embeddings import local_encode
+
+        while True:
+            try:
+                request = _recv_header(self.connection)
+            except (ConnectionError, OSError):
+                return
+            try:
+                embeddings = local_encode(request['texts'], 'server', batch_size=request.get('batch_size', 32),
+                                          show_progress_bar=False)
+                embeddings = np.ascontiguousarray(embeddings, dtype=np.float32).reshape(len(request['texts']), -1)
+            except Exception as e:
+                _send_message(self.connection, {'error': str(e)})
+                continue
+            _send_message(self.connection, {'shape': list(embeddings.shape)}, embeddings.tobytes())
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def serve(socket_path):
+    """Load the model and serve encode requests on `socket_path` until interrupted."""
+    from .embeddings import get_model
+
+    get_model()  # Load before accepting connections
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = EmbeddingServer(socket_path, _EncodeHandler)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
@@ -3,20 +3,171 @@
 # import faiss
 # from django.conf import settings
 # from .models import TranscriptChunk
+import queue
+import threading
+import time
+from concurrent.futures import Future
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from django.conf import settings
+from karyon.metrics import EMBEDDING_INFERENCE, observe_seconds
+from .embedding_cache import QueryEmbeddingCache, normalize_question
+from .embedding_server import EmbeddingClient, EmbeddingServerError
 
-model = SentenceTransformer('all-MiniLM-L6-v2')
+# Loaded on first local use, so processes that only talk to the embedding
+# server never import torch or load the model
+_model = None
+_model_lock = threading.Lock()
+
+_server_client = None
+if settings.EMBEDDING_SERVER_SOCKET:
+    _server_client = EmbeddingClient(settings.EMBEDDING_SERVER_SOCKET, timeout=settings.EMBEDDING_SERVER_TIMEOUT)
 
 # FAISS_INDEX_PATH = os.path.join(settings.MEDIA_ROOT, 'faiss_index.bin')
 # CHUNK_MAPPING_PATH = os.path.join(settings.MEDIA_ROOT, 'chunk_mapping.json')
 
+def get_model():
+    """
+    Return the in-process embedding model, loading it on first use: a SentenceTransformer,
+    or an OnnxEmbedder with the same encode() interface when EMBEDDING_BACKEND is 'onnx'.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                if settings.EMBEDDING_BACKEND == 'onnx':
+                    from .onnx_embeddings import OnnxEmbedder
+                    _model = OnnxEmbedder(settings.EMBEDDING_ONNX_PATH, quantized=settings.EMBEDDING_ONNX_QUANTIZED,
+                                          num_threads=settings.EMBEDDING_ONNX_THREADS)
+                else:
+                    from sentence_transformers import SentenceTransformer
+                    _model = SentenceTransformer(settings.EMBEDDING_MODEL)
+    return _model
+
+def local_encode(texts, kind, **kwargs):
+    """
+    model.encode() in this process, with its inference time recorded under `kind`
+    (query, chunks, segments, transcript, frames, server).
+    """
+    with observe_seconds(EMBEDDING_INFERENCE, kind=kind):
+        return get_model().encode(texts, **kwargs)
+
+def encode(texts, kind, **kwargs):
+    """
+    Embed a text or list of texts, like model.encode().
+
+    Uses the shared embedding server when EMBEDDING_SERVER_SOCKET is set and it is
+    reachable, otherwise encodes in this process.
+    """
+    if _server_client is not None and _server_client.available:
+        single = isinstance(texts, str)
+        try:
+            embeddings = _server_client.encode([texts] if single else texts, batch_size=kwargs.get('batch_size', 32))
+            return embeddings[0] if single else embeddings
+        except (OSError, ConnectionError) as e:
+            print(f"Embedding server unavailable, encoding in-process: {str(e)}")
+        except EmbeddingServerError as e:
+            print(f"{str(e)}; encoding in-process")
+    return local_encode(texts, kind, **kwargs)
+
+class QueryBatcher:
+    """
+    Micro-batches concurrent single-text embedding requests into one forward pass.
+
+    Callers queue their text and wait on a Future. One worker thread takes the oldest
+    waiting text, gathers whatever else arrives within `max_wait` seconds (up to
+    `max_batch_size` texts), encodes them together and hands each caller its row.
+    A caller waits at most for the batch in progress plus its own, and requests
+    queue up naturally while a batch is running.
+    """
+
+    def __init__(self, max_batch_size=32, max_wait=0.002):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.SimpleQueue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def embed(self, text):
+        """Embed one text; returns a numpy vector."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='query-embedder', daemon=True)
+                self._worker.start()
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            texts = [text for text, _ in batch]
+            try:
+                embeddings = encode(texts, 'query', batch_size=len(texts), show_progress_bar=False)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+
+_query_batcher = QueryBatcher(
+    max_batch_size=settings.EMBED_BATCH_MAX_SIZE,
+    max_wait=settings.EMBED_BATCH_WAIT_MS / 1000,
+)
+
+def model_version():
+    """Identifies the vectors the configured model and backend produce (int8 ONNX differs slightly)."""
+    if settings.EMBEDDING_BACKEND == 'onnx':
+        return f"{settings.EMBEDDING_MODEL}:onnx{'-int8' if settings.EMBEDDING_ONNX_QUANTIZED else ''}"
+    return f"{settings.EMBEDDING_MODEL}:torch"
+
+_query_cache = None
+if settings.EMBEDDING_CACHE_ENABLED:
+    _query_cache = QueryEmbeddingCache(
+        settings.EMBEDDING_CACHE_PATH,
+        model_version(),
+        max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+        memory_entries=settings.EMBEDDING_CACHE_MEMORY_ENTRIES,
+    )
+
 def embed_text(text):
     """
     Generate embeddings for the given text using a pre-trained SentenceTransformer model.
     Returns a list of floats representing the embedding vector.
+
+    With EMBED_BATCHING on, concurrent calls are encoded together (see QueryBatcher).
+    With EMBEDDING_CACHE_ENABLED, repeated questions are served from the query cache.
     """
-    embedding = model.encode(text)
+    if _query_cache is not None:
+        # Keyed on the normalized text; the original text is what gets embedded
+        key = normalize_question(text)
+        embedding = _query_cache.get(key)
+        if embedding is not None:
+            return embedding.tolist()
+
+    if settings.EMBED_BATCHING:
+        embedding = _query_batcher.embed(text)
+    else:
+        embedding = encode(text, 'query')
+
+    if _query_cache is not None:
+        _query_cache.put(key, embedding)
     return embedding.tolist()
 
 def embed_chunks(chunks):
@@ -25,7 +176,7 @@ def embed_chunks(chunks):
     Returns a list of embedding vectors.
     """
     texts = [chunk.text for chunk in chunks]
-    return model.encode(texts, batch_size=32, show_progress_bar=True).tolist()
+    return encode(texts, 'chunks', batch_size=32, show_progress_bar=True).tolist()
 
 # def search_chunks(query, top_k=5, max_distance=1.5):
 #     """
@@ -60,13 +211,14 @@ def embed_chunks(chunks):
 #
 #     return results
 
-def find_best_segment(chunk, query):
+def find_best_segment(chunk, query, query_embedding=None):
     """
     Find the most relevant segment within a chunk for a given query.
     
     Args:
         chunk: TranscriptChunk object
         query: User's question
+        query_embedding: Embedding of the query, if the caller already has it
         
     Returns:
         Best matching segment dict with text, start, end
@@ -75,11 +227,12 @@ def find_best_segment(chunk, query):
         return None
     
     # Embed query
-    query_embedding = embed_text(query)
+    if query_embedding is None:
+        query_embedding = embed_text(query)
 
     # Embed all segments in the chunk
     segment_texts = [seg['text'] for seg in chunk.segments]
-    segment_embeddings = model.encode(segment_texts, show_progress_bar=False)
+    segment_embeddings = encode(segment_texts, 'segments', show_progress_bar=False)
 
     # Calculate cosine similarities
     query_vec = np.array(query_embedding)
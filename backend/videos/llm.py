@@ -0,0 +1,92 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+import httpx
+from django.conf import settings
+from openai import OpenAI
+from karyon.metrics import OPENAI_ERRORS, OPENAI_LATENCY, cache_lookup
+
+# One keep-alive connection pool shared by every OpenAI client in the process.
+# The API key is sent per request, so clients for different users can share it.
+_http_client = None
+_http_client_lock = threading.Lock()
+
+# OpenAI clients keyed by a hash of the API key (most recently used last)
+_clients = OrderedDict()
+_clients_lock = threading.Lock()
+
+class _InstrumentedTransport(httpx.HTTPTransport):
+    """Records latency (to response headers) and failures of every request, per API endpoint."""
+
+    def handle_request(self, request):
+        endpoint = request.url.path.rsplit('/v1/', 1)[-1]
+        start = time.perf_counter()
+        try:
+            response = super().handle_request(request)
+        except httpx.TransportError as e:
+            OPENAI_ERRORS.labels(endpoint=endpoint, error=type(e).__name__).inc()
+            raise
+        finally:
+            OPENAI_LATENCY.labels(endpoint=endpoint).observe(time.perf_counter() - start)
+        if response.status_code >= 400:
+            OPENAI_ERRORS.labels(endpoint=endpoint, error=str(response.status_code)).inc()
+        return response
+
+def openai_timeout(seconds):
+    """
+    httpx timeout for OpenAI requests: `seconds` overall, OPENAI_CONNECT_TIMEOUT to connect.
+    The SDK sends its own timeout with every request, replacing the http client's, so
+    this is what OpenAI() and with_options() must be given.
+    """
+    return httpx.Timeout(seconds, connect=settings.OPENAI_CONNECT_TIMEOUT)
+
+def _get_http_client():
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = httpx.Client(
+                    transport=_InstrumentedTransport(limits=httpx.Limits(
+                        max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.OPENAI_MAX_CONNECTIONS,
+                        keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY,
+                    )),
+                    timeout=openai_timeout(settings.OPENAI_TIMEOUT),
+                )
+    return _http_client
+
+def get_openai_client(api_key=None):
+    """
+    Return a cached OpenAI client for an API key (falls back to settings.OPENAI_API_KEY).
+
+    Clients are reused across calls, so frames and questions don't each pay for a new
+    connection pool and TLS handshake. At most OPENAI_CLIENT_CACHE_SIZE clients are kept;
+    the least recently used one is evicted. Requests go to OPENAI_BASE_URL when set
+    (e.g. the local stand-in from `manage.py openai_standin`).
+    """
+    api_key = api_key or settings.OPENAI_API_KEY
+    if not api_key:
+        # Let the SDK raise its usual missing-key error
+        return OpenAI(api_key=None)
+
+    cache_key = hashlib.sha256(api_key.encode()).hexdigest()
+    with _clients_lock:
+        client = _clients.get(cache_key)
+        cache_lookup('openai_client', client is not None)
+        if client is not None:
+            _clients.move_to_end(cache_key)
+            return client
+
+        client = OpenAI(
+            api_key=api_key,
+            base_url=settings.OPENAI_BASE_URL or None,
+            http_client=_get_http_client(),
+            timeout=openai_timeout(settings.OPENAI_TIMEOUT),
+            max_retries=settings.OPENAI_MAX_RETRIES,
+        )
+        _clients[cache_key] = client
+        # Evicted clients are not closed: closing would shut the shared connection pool
+        while len(_clients) > settings.OPENAI_CLIENT_CACHE_SIZE:
+            _clients.popitem(last=False)
+        return client
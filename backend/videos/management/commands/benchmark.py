@@ -0,0 +1,75 @@
+"""
+Management command to run the ingest/retrieval microbenchmarks.
+Usage: python manage.py benchmark [--only NAME ...] [--output results.json]
+                                  [--baseline benchmarks/baseline.json] [--threshold 0.2]
+                                  [--save-baseline] [--real-embeddings]
+
+Baselines are per machine and are not committed: record one with --save-baseline
+(written to backend/benchmarks/baseline.json) on the machine that will run the
+comparisons, before making the change being measured.
+"""
+import json
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from videos.benchmarks import BENCHMARKS, run_benchmarks, compare_to_baseline
+
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json')
+
+class Command(BaseCommand):
+    help = "Run offline microbenchmarks and compare them against a stored baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', nargs='+', choices=[b.name for b in BENCHMARKS],
+                            help="Run only these cases")
+        parser.add_argument('--repeat', type=int, help="Override the per-case repeat count")
+        parser.add_argument('--output', help="Write results JSON to this path")
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline results JSON")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="Allowed slowdown of the median vs baseline (0.2 = 20%%)")
+        parser.add_argument('--save-baseline', action='store_true',
+                            help="Store these results as the new baseline")
+        parser.add_argument('--real-embeddings', action='store_true',
+                            help="Time the configured embedding model instead of the offline stand-in")
+
+    def handle(self, *args, **options):
+        """Runs when the command is executed."""
+        report = run_benchmarks(names=options['only'], repeat=options['repeat'], log=self.stdout.write,
+                                real_embeddings=options['real_embeddings'])
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        baseline_path = options['baseline']
+        if options['save_baseline']:
+            os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+            with open(baseline_path, 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {baseline_path}"))
+            return
+
+        if not os.path.exists(baseline_path):
+            self.stdout.write(self.style.WARNING(
+                f"No baseline at {baseline_path}. Run with --save-baseline to create one."
+            ))
+            return
+
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        if baseline['meta'].get('embeddings', 'real') != report['meta']['embeddings']:
+            raise CommandError("Baseline was recorded with different embeddings; rerun with the same "
+                               "--real-embeddings setting or save a new baseline.")
+
+        regressions = []
+        for name, before, after, ratio, regressed in compare_to_baseline(report, baseline, options['threshold']):
+            line = f"{name}: {before:.2f} ms -> {after:.2f} ms ({ratio:.2f}x)"
+            if regressed:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(self.style.SUCCESS(line))
+
+        if regressions:
+            raise CommandError(f"Regressions over {options['threshold']:.0%}: {', '.join(regressions)}")
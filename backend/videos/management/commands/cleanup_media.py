@@ -0,0 +1,56 @@
+"""
+Management command to reclaim media storage.
+Usage: python manage.py cleanup_media [--dry-run] [--min-age-hours 24] [--audio-older-than-days 7]
+
+Deletes files under MEDIA_ROOT that no video references (left behind by failed
+ingests or deletions made before files were cleaned up with their rows), and the
+extracted audio of ready videos when STORAGE_DELETE_AUDIO_AFTER_READY is off.
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from videos.models import Video
+from videos.persistence import update_video
+from videos.storage import delete_unreferenced, find_orphans
+
+class Command(BaseCommand):
+    help = "Delete unreferenced media files and aged-out intermediates."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be deleted")
+        parser.add_argument('--min-age-hours', type=float, default=24,
+                            help="Leave files younger than this alone (uploads and ingests in progress)")
+        parser.add_argument('--audio-older-than-days', type=float,
+                            help="Also delete extracted audio of ready videos created before this")
+
+    def handle(self, *args, **options):
+        """Runs when the command is executed."""
+        dry_run = options['dry_run']
+        orphans = find_orphans(min_age_seconds=options['min_age_hours'] * 3600)
+        for name, size in orphans:
+            self.stdout.write(f"Orphan {name} ({size / 1e6:.1f} MB)")
+        orphan_bytes = sum(size for _, size in orphans)
+        if not dry_run:
+            orphan_bytes = delete_unreferenced([name for name, _ in orphans])
+
+        audio_bytes = 0
+        audio_count = 0
+        if options['audio_older_than_days'] is not None:
+            cutoff = timezone.now() - timedelta(days=options['audio_older_than_days'])
+            videos = (Video.objects.filter(status='ready', created_at__lt=cutoff)
+                      .exclude(audio_file='').exclude(audio_file__isnull=True).only('id', 'audio_file'))
+            for video in videos:
+                name = video.audio_file.name
+                audio_count += 1
+                if dry_run:
+                    if video.audio_file.storage.exists(name):
+                        audio_bytes += video.audio_file.size
+                    continue
+                update_video(video, audio_file=None)
+                audio_bytes += delete_unreferenced([name])
+
+        verb = "Would free" if dry_run else "Freed"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {(orphan_bytes + audio_bytes) / 1e6:.1f} MB: "
+            f"{len(orphans)} orphaned files, {audio_count} extracted audio files"
+        ))
@@ -0,0 +1,25 @@
+"""
+Management command to run the shared embedding server.
+Usage: python manage.py embedding_server [--socket /tmp/karyon-embeddings.sock]
+
+Web workers and ingest threads use it when EMBEDDING_SERVER_SOCKET points at the
+same path, instead of each loading the embedding model.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from videos.embedding_server import serve
+
+class Command(BaseCommand):
+    help = "Serve embedding requests from one shared model over a Unix socket."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=settings.EMBEDDING_SERVER_SOCKET or '/tmp/karyon-embeddings.sock',
+                            help="Unix socket path (default: EMBEDDING_SERVER_SOCKET)")
+
+    def handle(self, *args, **options):
+        """Runs when the command is executed."""
+        self.stdout.write(self.style.SUCCESS(f"Starting embedding server on {options['socket']}"))
+        try:
+            serve(options['socket'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,82 @@
+"""
+Management command to ingest many local video files at once.
+Usage: python manage.py ingest_directory --user alice@example.com [DIRECTORY] [--manifest files.txt]
+                                         [--mode both] [--workers 2] [--transcription-backend local]
+
+Safe to rerun: files that are already ingested for the user are skipped, failed or
+interrupted ones are processed again. Files that would put the user over their storage
+quota are skipped.
+"""
+import os
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from videos.bulk_ingest import discover_files, register_videos, process_videos
+from videos.models import Video
+
+class Command(BaseCommand):
+    help = "Register and process a directory (or manifest) of video files across a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', nargs='?', help="Directory searched recursively for videos")
+        parser.add_argument('--manifest', help="Text file with one video path per line")
+        parser.add_argument('--user', required=True, help="Username or email of the owner")
+        parser.add_argument('--mode', default='both', choices=[c[0] for c in Video.PROCESSING_MODE_CHOICES])
+        parser.add_argument('--transcription-backend', default='',
+                            choices=[''] + [c[0] for c in Video.TRANSCRIPTION_BACKEND_CHOICES])
+        parser.add_argument('--workers', type=int, default=2, help="Videos processed at the same time")
+        parser.add_argument('--threads-per-worker', type=int,
+                            help="CPU threads per worker (default: CPUs divided by workers)")
+
+    def handle(self, *args, **options):
+        """Runs when the command is executed."""
+        if not options['directory'] and not options['manifest']:
+            raise CommandError("Give a directory, a --manifest, or both.")
+
+        user = User.objects.filter(username=options['user']).first() or \
+            User.objects.filter(email=options['user']).first()
+        if user is None:
+            raise CommandError(f"No user {options['user']}")
+
+        # Same key resolution as uploads through the API
+        from videos.encryption import decrypt
+        profile = user.profile
+        openai_key = decrypt(profile.encrypted_openai_key) if profile.encrypted_openai_key else None
+        if not openai_key and not settings.OPENAI_API_KEY:
+            raise CommandError(f"No OpenAI API key configured for {options['user']} or in settings.")
+
+        paths = discover_files(options['directory'], options['manifest'])
+        missing = [path for path in paths if not os.path.isfile(path)]
+        if missing:
+            raise CommandError(f"Files not found: {', '.join(missing[:5])}")
+        self.stdout.write(f"Found {len(paths)} video files")
+
+        video_ids, skipped, over_quota = register_videos(paths, user, options['mode'],
+                                                         options['transcription_backend'], log=self.stdout.write)
+        self.stdout.write(f"{len(video_ids)} to process, {skipped} already ingested")
+        if over_quota:
+            self.stdout.write(self.style.WARNING(f"{over_quota} skipped: over the storage quota"))
+        if not video_ids:
+            return
+
+        workers = max(1, options['workers'])
+        threads = options['threads_per_worker'] or max(1, (os.cpu_count() or 1) // workers)
+        total_bytes = sum(video.file.size for video in Video.objects.filter(id__in=video_ids) if video.file)
+
+        start = time.perf_counter()
+        results = process_videos(video_ids, openai_key=openai_key, workers=workers,
+                                 threads_per_worker=threads, log=self.stdout.write)
+        elapsed = time.perf_counter() - start
+
+        failed = [r for r in results if r[2] != 'ready']
+        self.stdout.write(
+            f"Processed {len(results)} videos ({total_bytes / 1e9:.2f} GB) in {elapsed:.0f}s: "
+            f"{len(results) / elapsed * 3600:.1f} videos/hour, {total_bytes / 1e6 / elapsed:.1f} MB/s"
+        )
+        if failed:
+            self.stdout.write(self.style.ERROR(f"{len(failed)} failed:"))
+            for video_id, title, status, error, _ in failed:
+                self.stdout.write(self.style.ERROR(f"  {title or video_id}: {error}"))
+            raise CommandError("Some videos failed; rerun the command to retry them.")
+        self.stdout.write(self.style.SUCCESS("All videos ingested"))
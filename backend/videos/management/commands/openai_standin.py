@@ -0,0 +1,112 @@
+"""
+Management command to run a local stand-in for the OpenAI API.
+Usage: python manage.py openai_standin [--port 8765] [--latency-ms 0]
+
+Point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:8765/v1 to run
+and benchmark the whole pipeline offline. It answers the endpoints we use
+(audio transcriptions, chat completions incl. vision) with canned content.
+"""
+import json
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.core.management.base import BaseCommand
+
+# Topics cycled through by fake transcripts, so semantic chunking has boundaries to find
+TOPICS = [
+    "Gradient descent updates the weights by stepping against the gradient of the loss.",
+    "A linked list stores each element together with a pointer to the next node.",
+    "Photosynthesis converts light energy into chemical energy stored in glucose.",
+    "The derivative measures how a function changes as its input changes.",
+]
+
+# Bitrate extract_audio uses, to estimate audio duration from upload size
+AUDIO_BITRATE = 32000
+SEGMENT_SECONDS = 5.0
+
+def fake_segments(audio_bytes):
+    duration = max(audio_bytes * 8 / AUDIO_BITRATE, SEGMENT_SECONDS)
+    segments = []
+    start = 0.0
+    idx = 0
+    while start < duration:
+        end = min(start + SEGMENT_SECONDS, duration)
+        # Stay on one topic for ~1 minute
+        text = f" {TOPICS[(idx // 12) % len(TOPICS)]} Point {idx}."
+        segments.append({'id': idx, 'seek': 0, 'start': start, 'end': end, 'text': text,
+                         'tokens': [], 'temperature': 0.0, 'avg_logprob': 0.0,
+                         'compression_ratio': 1.0, 'no_speech_prob': 0.0})
+        start = end
+        idx += 1
+    return {'task': 'transcribe', 'language': 'english', 'duration': duration,
+            'text': ''.join(s['text'] for s in segments), 'segments': segments}
+
+def fake_chat_completion(payload):
+    messages = payload.get('messages', [])
+    last = messages[-1]['content'] if messages else ''
+    is_vision = isinstance(last, list) and any(part.get('type') == 'image_url' for part in last)
+    if is_vision:
+        content = "TEXT: Stand-in slide: gradient descent, w = w - lr * grad\nVISUALS: A loss curve decreasing over epochs"
+    else:
+        content = "This is a stand-in answer based on the provided video context."
+    prompt_tokens = sum(len(str(m.get('content', ''))) for m in messages) // 4
+    return {
+        'id': f'chatcmpl-{uuid.uuid4().hex}',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': payload.get('model', 'gpt-4o'),
+        'choices': [{'index': 0, 'finish_reason': 'stop',
+                     'message': {'role': 'assistant', 'content': content}}],
+        'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(content) // 4,
+                  'total_tokens': prompt_tokens + len(content) // 4},
+    }
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real API
+    disable_nagle_algorithm = True
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        if self.latency:
+            time.sleep(self.latency)
+
+        if self.path.endswith('/audio/transcriptions'):
+            self._send_json(200, fake_segments(length))
+        elif self.path.endswith('/chat/completions'):
+            self._send_json(200, fake_chat_completion(json.loads(body or b'{}')))
+        else:
+            self._send_json(404, {'error': {'message': f'Unknown endpoint {self.path}', 'type': 'invalid_request_error'}})
+
+class Command(BaseCommand):
+    help = "Run a local stand-in for the OpenAI API (for offline runs and benchmarks)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency-ms', type=float, default=0, help="Artificial delay per request")
+
+    def handle(self, *args, **options):
+        """Runs when the command is executed."""
+        StandinHandler.latency = options['latency_ms'] / 1000
+        server = ThreadingHTTPServer((options['host'], options['port']), StandinHandler)
+        url = f"http://{options['host']}:{options['port']}/v1"
+        self.stdout.write(self.style.SUCCESS(f"OpenAI stand-in listening. Set OPENAI_BASE_URL={url}"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 09:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("videos", "0016_chatsession_chatmessage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="video",
+            name="playback_file",
+            field=models.FileField(blank=True, null=True, upload_to="playback/"),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-19 09:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("videos", "0017_video_playback_file"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="chatmessage",
+            index=models.Index(
+                fields=["session", "created_at"], name="videos_chat_session_8dad17_idx"
+            ),
+        ),
+    ]
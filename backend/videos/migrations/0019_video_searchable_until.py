@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 09:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("videos", "0018_chatmessage_session_created_at_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="video",
+            name="audio_searchable_until",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="video",
+            name="visual_searchable_until",
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.1 on 2026-10-19 09:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("videos", "0019_video_searchable_until"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="video",
+            name="transcription_backend",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("openai", "OpenAI Whisper API"),
+                    ("local", "Local CPU (faster-whisper)"),
+                ],
+                default="",
+                max_length=20,
+            ),
+        ),
+    ]
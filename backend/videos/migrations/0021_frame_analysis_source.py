@@ -0,0 +1,27 @@
+# Generated by Django 6.0.1 on 2026-10-19 09:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("videos", "0020_video_transcription_backend"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="video",
+            name="frame_analysis_stats",
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="videoframe",
+            name="analysis_source",
+            field=models.CharField(
+                choices=[("vision", "GPT-4o Vision"), ("ocr", "Local OCR")],
+                default="vision",
+                max_length=10,
+            ),
+        ),
+    ]
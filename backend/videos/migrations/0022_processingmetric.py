@@ -0,0 +1,56 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("videos", "0021_frame_analysis_source"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProcessingMetric",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("stage", models.CharField(max_length=30)),
+                ("started_at", models.DateTimeField()),
+                ("succeeded", models.BooleanField(default=True)),
+                ("wall_time", models.FloatField(default=0)),
+                ("cpu_time", models.FloatField(default=0)),
+                ("bytes_in", models.BigIntegerField(default=0)),
+                ("bytes_out", models.BigIntegerField(default=0)),
+                ("api_calls", models.IntegerField(default=0)),
+                ("tokens", models.IntegerField(default=0)),
+                ("frames_decoded", models.IntegerField(default=0)),
+                ("frames_kept", models.IntegerField(default=0)),
+                (
+                    "video",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="processing_metrics",
+                        to="videos.video",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["video", "started_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["stage", "started_at"],
+                        name="videos_proc_stage_c28b31_idx",
+                    )
+                ],
+            },
+        ),
+    ]
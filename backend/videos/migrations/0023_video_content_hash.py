@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("videos", "0022_processingmetric"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="video",
+            name="content_hash",
+            field=models.CharField(
+                blank=True, db_index=True, default="", max_length=64
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:10
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("videos", "0023_video_content_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="video",
+            name="caption_file",
+            field=models.FileField(
+                blank=True,
+                null=True,
+                upload_to="captions/",
+                validators=[
+                    django.core.validators.FileExtensionValidator(
+                        allowed_extensions=["srt", "vtt"]
+                    )
+                ],
+            ),
+        ),
+    ]
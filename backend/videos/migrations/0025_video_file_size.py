@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("videos", "0024_video_caption_file"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="video",
+            name="file_size",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="video",
+            name="audio_file",
+            field=models.FileField(
+                blank=True, max_length=255, null=True, upload_to="audio/"
+            ),
+        ),
+    ]
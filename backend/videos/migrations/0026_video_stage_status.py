@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("videos", "0025_video_file_size"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="video",
+            name="stage_status",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
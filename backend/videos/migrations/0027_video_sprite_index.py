@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("videos", "0026_video_stage_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="video",
+            name="sprite_index",
+            field=models.FileField(blank=True, null=True, upload_to="sprites/"),
+        ),
+    ]
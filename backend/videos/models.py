@@ -2,7 +2,8 @@ from django.db import models
 from django.core.validators import FileExtensionValidator
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
+from django.db import transaction
 from django.dispatch import receiver
 
 class UserProfile(models.Model):
@@ -37,9 +38,16 @@ class Video(models.Model):
         ('both', 'Audio + Visual'),
     ]
 
+    TRANSCRIPTION_BACKEND_CHOICES = [
+        ('openai', 'OpenAI Whisper API'),
+        ('local', 'Local CPU (faster-whisper)'),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='videos', null=True, blank=True)
     title = models.CharField(max_length=200)
     processing_mode = models.CharField(max_length=20, choices=PROCESSING_MODE_CHOICES, default='both')
+    # Empty means the deployment default (settings.TRANSCRIPTION_BACKEND)
+    transcription_backend = models.CharField(max_length=20, choices=TRANSCRIPTION_BACKEND_CHOICES, blank=True, default='')
     file = models.FileField(
         upload_to='videos/',
         validators=[FileExtensionValidator(allowed_extensions=['mp4', 'mov', 'avi', 'mkv', 'webm', 'flv', 'wmv', 'm4v'])],
@@ -47,14 +55,52 @@ class Video(models.Model):
         null=True
     )  # Only accept video files
     youtube_url = models.URLField(blank=True, null=True)  # Optional YouTube URL
-    audio_file = models.FileField(upload_to='audio/', blank=True, null=True)  # Extracted audio for transcription
+    audio_file = models.FileField(upload_to='audio/', max_length=255, blank=True, null=True)  # Extracted audio (audio/<video id>/), for transcription
+    caption_file = models.FileField(
+        upload_to='captions/',
+        validators=[FileExtensionValidator(allowed_extensions=['srt', 'vtt'])],
+        blank=True,
+        null=True
+    )  # Uploaded or YouTube captions, used instead of transcription when usable
+    playback_file = models.FileField(upload_to='playback/', blank=True, null=True)  # Faststart MP4 rendition for the player
+    sprite_index = models.FileField(upload_to='sprites/', blank=True, null=True)  # JSON index of keyframe sprite sheets
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploaded')
     transcript_data = models.JSONField(null=True, blank=True)  # Store Whisper segments
     created_at = models.DateTimeField(auto_now_add=True)
     error_message = models.TextField(blank=True, null=True)  # Store error details if processing fails
+    # How far (in seconds from the start) each branch has been published while processing
+    audio_searchable_until = models.FloatField(null=True, blank=True)
+    visual_searchable_until = models.FloatField(null=True, blank=True)
+    # Progress of each pipeline stage while processing: {stage: 'pending' | 'running' | 'done' | ...}
+    stage_status = models.JSONField(null=True, blank=True)
+    # Keyframe counts by analysis source (local OCR vs GPT-4o) and the share handled locally
+    frame_analysis_stats = models.JSONField(null=True, blank=True)
+    # SHA-256 of the video file, to recognize files that were already ingested
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    # Size of the original media in bytes, counted against the owner's storage quota
+    file_size = models.BigIntegerField(null=True, blank=True)
     
     def __str__(self):
         return self.title
+
+    @property
+    def searchable_ranges(self):
+        """Time ranges that can already be queried, per branch: {'audio': [[start, end]], ...}."""
+        ranges = {}
+        if self.audio_searchable_until is not None:
+            ranges['audio'] = [[0.0, self.audio_searchable_until]]
+        if self.visual_searchable_until is not None:
+            ranges['visual'] = [[0.0, self.visual_searchable_until]]
+        return ranges
+
+    @property
+    def is_searchable(self):
+        """True once any part of the video can be queried (possibly before processing finishes)."""
+        if self.status == 'ready':
+            return True
+        if self.status == 'failed':
+            return False
+        return bool(self.searchable_ranges)
     
     def clean(self):
         """Ensure either a file or YouTube URL is provided, but not both."""
@@ -87,10 +133,16 @@ class TranscriptChunk(models.Model):
 class VideoFrame(models.Model):
     """Extracted keyframe with visual analysis."""
 
+    ANALYSIS_SOURCE_CHOICES = [
+        ('vision', 'GPT-4o Vision'),
+        ('ocr', 'Local OCR'),
+    ]
+
     video = models.ForeignKey(Video, related_name='frames', on_delete=models.CASCADE)
     timestamp = models.FloatField()  # Timestamp in seconds
     image = models.ImageField(upload_to='frames/', null=True, blank=True)
-    visual_context = models.TextField() # GPT-4o vision analysis of the frame
+    visual_context = models.TextField() # GPT-4o vision (or local OCR) analysis of the frame
+    analysis_source = models.CharField(max_length=10, choices=ANALYSIS_SOURCE_CHOICES, default='vision')
     embedding = models.JSONField(null=True, blank=True)  # Embedding of visual_context text
 
     def __str__(self):
@@ -99,6 +151,28 @@ class VideoFrame(models.Model):
     class Meta:
         ordering = ['video', 'timestamp']  # Order by timestamp
 
+class ProcessingMetric(models.Model):
+    """Timing and cost of one pipeline stage for one video."""
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='processing_metrics')
+    stage = models.CharField(max_length=30)  # e.g. 'download', 'transcribe', 'analyze_frames'
+    started_at = models.DateTimeField()
+    succeeded = models.BooleanField(default=True)
+    wall_time = models.FloatField(default=0)  # Seconds
+    cpu_time = models.FloatField(default=0)   # CPU seconds of the stage's thread plus its ffmpeg/ffprobe subprocesses
+    bytes_in = models.BigIntegerField(default=0)
+    bytes_out = models.BigIntegerField(default=0)
+    api_calls = models.IntegerField(default=0)
+    tokens = models.IntegerField(default=0)
+    frames_decoded = models.IntegerField(default=0)
+    frames_kept = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['video', 'started_at']
+        indexes = [models.Index(fields=['stage', 'started_at'])]  # Per-stage capacity queries
+
+    def __str__(self):
+        return f"{self.video.title} - {self.stage} ({self.wall_time:.1f}s)"
+
 class ChatSession(models.Model):
     """A chat conversation about a specific video."""
     video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='chat_sessions')
@@ -122,6 +196,14 @@ class ChatMessage(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [models.Index(fields=['session', 'created_at'])]  # Recent-window history lookups
 
     def __str__(self):
-        return f"{self.role}: {self.content[:50]}"
\ No newline at end of file
+        return f"{self.role}: {self.content[:50]}"
+
+@receiver(post_delete, sender=Video)
+def delete_video_media(sender, instance, **kwargs):
+    # After commit, so a rolled back delete keeps its files and dedup references are final
+    from .storage import delete_video_files, video_file_names
+    video_id, names = instance.id, video_file_names(instance)
+    transaction.on_commit(lambda: delete_video_files(video_id, names))
@@ -0,0 +1,87 @@
+import re
+from io import BytesIO
+import cv2
+import numpy as np
+from PIL import Image
+from django.conf import settings
+
+# Characters that suggest an equation; those frames go to the vision model for exact notation
+MATH_CHARS_RE = re.compile(r'[=^√∑∫∂πλθσμ±≤≥≠≈→←∞×÷]')
+
+_tesseract_available = None
+
+def tesseract_available():
+    """Check once per process whether pytesseract and the tesseract binary are usable."""
+    global _tesseract_available
+    if _tesseract_available is None:
+        try:
+            import pytesseract
+            pytesseract.get_tesseract_version()
+            _tesseract_available = True
+        except Exception:
+            _tesseract_available = False
+    return _tesseract_available
+
+def _ocr_words(gray):
+    """Run Tesseract and return (lines, confidences, boxes) for recognized words."""
+    import pytesseract
+
+    data = pytesseract.image_to_data(gray, output_type=pytesseract.Output.DICT)
+
+    lines = {}
+    confidences = []
+    boxes = []
+    for i, word in enumerate(data['text']):
+        word = word.strip()
+        conf = float(data['conf'][i])
+        if not word or conf < 0:
+            continue
+        key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        lines.setdefault(key, []).append(word)
+        confidences.append(conf)
+        boxes.append((data['left'][i], data['top'][i], data['width'][i], data['height'][i]))
+
+    return [' '.join(words) for _, words in sorted(lines.items())], confidences, boxes
+
+def _graphics_ratio(gray, boxes):
+    """Share of the frame's edge pixels that lie outside text boxes (diagrams, plots, photos)."""
+    edges = cv2.Canny(gray, 100, 200)
+    for left, top, width, height in boxes:
+        edges[max(top - 4, 0):top + height + 4, max(left - 4, 0):left + width + 4] = 0
+    return cv2.countNonZero(edges) / edges.size
+
+def local_analyze_frame(frame_bytes):
+    """
+    Try to describe a frame locally with OCR, in the same format analyze_frame returns.
+
+    Handles plain-text slides and blank frames. Frames with low OCR confidence,
+    equations, or graphics outside the text are left for the vision model.
+
+    Args:
+        frame_bytes: JPEG image as bytes
+
+    Returns:
+        visual_context string, or None if the frame should be escalated to GPT-4o
+    """
+    if not settings.FRAME_OCR_ENABLED or not tesseract_available():
+        return None
+
+    image = Image.open(BytesIO(frame_bytes)).convert('L')
+    gray = np.array(image)
+
+    lines, confidences, boxes = _ocr_words(gray)
+    text = '\n'.join(lines)
+
+    if _graphics_ratio(gray, boxes) > settings.FRAME_OCR_MAX_GRAPHICS_RATIO:
+        return None
+
+    # Nothing on screen at all: answer locally so the frame gets skipped without an API call
+    if not confidences:
+        return "TEXT: None\nVISUALS: None"
+
+    if np.mean(confidences) < settings.FRAME_OCR_MIN_CONFIDENCE:
+        return None
+    if MATH_CHARS_RE.search(text):
+        return None
+
+    return f"TEXT: {text}\nVISUALS: None"
@@ -0,0 +1,206 @@
+"""
+ONNX Runtime backend for the sentence embedding model (EMBEDDING_BACKEND=onnx).
+
+Runs the same all-MiniLM-L6-v2 network without torch: the transformer is exported
+to ONNX (optionally with dynamic int8 weight quantization) and the SentenceTransformer
+pooling is reproduced here (mean over tokens, then L2 normalization), so vectors
+stay comparable with embeddings already stored by the torch backend.
+
+Export once, with torch and sentence-transformers installed (the Dockerfile does
+this in a build stage). This module has no Django imports so it can run standalone:
+
+Usage:
+    python videos/onnx_embeddings.py onnx-model [--model all-MiniLM-L6-v2] [--quantize]
+                                                [--min-cosine 0.99]
+
+The export is checked against the torch model on sample sentences and fails if any
+cosine similarity falls below --min-cosine. The torch embeddings of those sentences
+are saved with the model, so the check (and the test suite's copy of it) can be
+repeated later without torch.
+"""
+import argparse
+import json
+import os
+import numpy as np
+
+CONFIG_FILE = 'embedding_config.json'
+FP32_FILE = 'model.onnx'
+INT8_FILE = 'model_int8.onnx'
+# Torch embeddings of VERIFY_TEXTS, written at export
+REFERENCE_FILE = 'reference_embeddings.npy'
+
+# Lowest acceptable cosine similarity between ONNX and torch embeddings of VERIFY_TEXTS
+MIN_COSINE = 0.99
+
+# Sentences used to check an export against the torch model
+VERIFY_TEXTS = [
+    "Gradient descent updates the weights by stepping against the gradient of the loss.",
+    "what does the lecture say about linked lists",
+    "TEXT: f(x) = x^2 + 3x - 4\nVISUALS: A parabola crossing the x axis twice",
+    "Photosynthesis converts light energy into chemical energy stored in glucose.",
+    "ok",
+    "The derivative measures how a function changes as its input changes. " * 30,
+]
+
+class OnnxEmbedder:
+    """
+    Drop-in replacement for the parts of SentenceTransformer.encode() the app uses.
+
+    Args:
+        model_dir: Directory written by export()
+        quantized: Use the int8 model instead of the fp32 one
+        num_threads: ONNX Runtime intra-op threads (0 = runtime default)
+    """
+
+    def __init__(self, model_dir, quantized=True, num_threads=0):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, CONFIG_FILE)) as f:
+            self.config = json.load(f)
+
+        model_path = os.path.join(model_dir, INT8_FILE if quantized else FP32_FILE)
+        if not os.path.exists(model_path):
+            raise RuntimeError(
+                f"ONNX embedding model not found at {model_path}. "
+                f"Export it with: python videos/onnx_embeddings.py {model_dir}"
+                + (" --quantize" if quantized else "")
+            )
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=self.config['max_seq_length'])
+        self.tokenizer.enable_padding(pad_id=self.config['pad_token_id'], pad_token=self.config['pad_token'])
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {'input_ids': input_ids, 'attention_mask': attention_mask}
+        if 'token_type_ids' in self.input_names:
+            feeds['token_type_ids'] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real tokens, as in sentence-transformers' Pooling module
+        mask = attention_mask[..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        embeddings = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.config['normalize']:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings.astype(np.float32)
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        """
+        Embed a text or list of texts.
+
+        Returns:
+            1-D array for a single string, otherwise an array of shape (len(texts), dim)
+        """
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+        if not texts:
+            return np.zeros((0, self.config['dimension']), dtype=np.float32)
+
+        # Batch texts of similar length together to minimize padding
+        order = np.argsort([-len(text) for text in texts], kind='stable')
+        embeddings = np.empty((len(texts), self.config['dimension']), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            idx = order[start:start + batch_size]
+            embeddings[idx] = self._encode_batch([texts[i] for i in idx])
+        return embeddings[0] if single else embeddings
+
+def export(output_dir, model_name='all-MiniLM-L6-v2', quantize=False):
+    """
+    Export a SentenceTransformer model to ONNX in `output_dir` (requires torch).
+
+    Writes model.onnx, tokenizer.json, embedding_config.json, the torch embeddings of
+    VERIFY_TEXTS and, with quantize, model_int8.onnx (dynamic int8 weights).
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    st_model = SentenceTransformer(model_name, device='cpu')
+    transformer = st_model[0]
+    pooling = next(m for m in st_model if isinstance(m, Pooling))
+    if pooling.get_pooling_mode_str() != 'mean':
+        raise RuntimeError(f"Only mean pooling is supported, {model_name} uses {pooling.get_pooling_mode_str()}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = transformer.tokenizer
+    tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, CONFIG_FILE), 'w') as f:
+        json.dump({
+            'model_name': model_name,
+            'max_seq_length': st_model.max_seq_length,
+            'dimension': st_model.get_sentence_embedding_dimension(),
+            'normalize': any(isinstance(m, Normalize) for m in st_model),
+            'pad_token': tokenizer.pad_token,
+            'pad_token_id': tokenizer.pad_token_id,
+        }, f, indent=2)
+    np.save(os.path.join(output_dir, REFERENCE_FILE), st_model.encode(VERIFY_TEXTS, normalize_embeddings=True))
+
+    auto_model = transformer.auto_model.eval()
+    sample = tokenizer(["an example sentence"], return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+
+    fp32_path = os.path.join(output_dir, FP32_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            auto_model,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            dynamo=False,
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(fp32_path, os.path.join(output_dir, INT8_FILE), weight_type=QuantType.QInt8)
+
+def verify(model_dir, quantized=False):
+    """
+    Compare ONNX embeddings of VERIFY_TEXTS with the torch embeddings saved at export.
+
+    Returns:
+        Lowest cosine similarity over VERIFY_TEXTS
+    """
+    onnx_model = OnnxEmbedder(model_dir, quantized=quantized)
+    expected = np.load(os.path.join(model_dir, REFERENCE_FILE))
+    expected = expected / np.linalg.norm(expected, axis=1, keepdims=True)
+    actual = onnx_model.encode(VERIFY_TEXTS)
+    actual = actual / np.linalg.norm(actual, axis=1, keepdims=True)
+    return float(np.min(np.sum(expected * actual, axis=1)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the sentence embedding model to ONNX.")
+    parser.add_argument('output_dir')
+    parser.add_argument('--model', default='all-MiniLM-L6-v2')
+    parser.add_argument('--quantize', action='store_true', help="Also write a dynamic int8 model")
+    parser.add_argument('--min-cosine', type=float, default=MIN_COSINE,
+                        help="Fail if any sample's cosine similarity to the torch embedding is lower")
+    args = parser.parse_args()
+
+    export(args.output_dir, model_name=args.model, quantize=args.quantize)
+    for quantized in ([False, True] if args.quantize else [False]):
+        cosine = verify(args.output_dir, quantized=quantized)
+        label = 'int8' if quantized else 'fp32'
+        print(f"{label}: min cosine similarity to torch embeddings {cosine:.5f}")
+        if cosine < args.min_cosine:
+            raise SystemExit(f"{label} export is below the {args.min_cosine} cosine tolerance")
+
+if __name__ == '__main__':
+    main()
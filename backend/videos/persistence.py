@@ -0,0 +1,75 @@
+from django.db import transaction
+from .models import Video, TranscriptChunk, VideoFrame
+
+def update_video(video, **fields):
+    """
+    Write only the given columns of a Video row and mirror them on the instance.
+
+    Use this instead of video.save() during ingest: save() rewrites every column,
+    including the (potentially huge) transcript_data JSON.
+    """
+    Video.objects.filter(id=video.id).update(**fields)
+    for name, value in fields.items():
+        setattr(video, name, value)
+
+def set_status(video, status, **fields):
+    """Narrow status update, optionally with other small columns (e.g. error_message)."""
+    update_video(video, status=status, **fields)
+
+def save_chunks(video, chunks, embeddings, first_chunk_id=0):
+    """
+    Insert transcript chunks and their embeddings in one transaction with a single bulk INSERT.
+
+    Args:
+        video: Video model instance
+        chunks: List of chunk dicts with text, start, end, segments
+        embeddings: Matching sequence of embedding vectors (numpy arrays or lists)
+        first_chunk_id: chunk_id assigned to the first chunk
+
+    Returns:
+        List of created TranscriptChunk objects
+    """
+    objects = [
+        TranscriptChunk(
+            video=video,
+            chunk_id=first_chunk_id + idx,
+            text=chunk['text'],
+            start_time=chunk['start'],
+            end_time=chunk['end'],
+            segments=chunk.get('segments', []),
+            embedding=embedding.tolist() if hasattr(embedding, 'tolist') else list(embedding),
+        )
+        for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings))
+    ]
+    with transaction.atomic():
+        return TranscriptChunk.objects.bulk_create(objects)
+
+def save_frames(video, frames):
+    """
+    Insert analyzed keyframes in one transaction with a single bulk INSERT.
+
+    Args:
+        video: Video model instance
+        frames: List of dicts with timestamp, visual_context, embedding
+
+    Returns:
+        List of created VideoFrame objects
+    """
+    objects = [VideoFrame(video=video, **frame) for frame in frames]
+    with transaction.atomic():
+        return VideoFrame.objects.bulk_create(objects)
+
+def clear_results(video):
+    """
+    Delete a video's chunks and frames and reset it to 'uploaded', so an interrupted
+    or failed run can be processed again without duplicating rows.
+    """
+    from .storage import delete_video_dirs
+
+    with transaction.atomic():
+        TranscriptChunk.objects.filter(video=video).delete()
+        VideoFrame.objects.filter(video=video).delete()
+        update_video(video, status='uploaded', error_message=None, transcript_data=None,
+                     audio_searchable_until=None, visual_searchable_until=None, frame_analysis_stats=None,
+                     stage_status=None, sprite_index=None)
+    delete_video_dirs(video.id)
@@ -0,0 +1,81 @@
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from django.utils import timezone
+
+def _children_cpu_time():
+    """CPU seconds used by finished child processes (ffmpeg, ffprobe) of this process."""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+# Stats of the stage running in the current thread, so helpers deep in the
+# pipeline (API calls, frame decoding) can report counts without extra arguments
+_local = threading.local()
+
+COUNTERS = ('bytes_in', 'bytes_out', 'api_calls', 'tokens', 'frames_decoded', 'frames_kept')
+
+class StageStats:
+    """Counters collected while a stage runs."""
+
+    def __init__(self):
+        for name in COUNTERS:
+            setattr(self, name, 0)
+
+    def add(self, **counts):
+        for name, value in counts.items():
+            setattr(self, name, getattr(self, name) + (value or 0))
+
+def record(**counts):
+    """
+    Add counts (api_calls, tokens, frames_decoded, ...) to the stage running in this thread.
+    Does nothing outside track_stage, so instrumented helpers can be called from anywhere.
+    """
+    stats = getattr(_local, 'stats', None)
+    if stats is not None:
+        stats.add(**counts)
+
+@contextmanager
+def track_stage(video, stage):
+    """
+    Time a pipeline stage and store a ProcessingMetric row for it, even if it fails.
+
+    cpu_time is this thread's CPU time plus that of child processes that finished
+    during the stage (ffmpeg does most of the work in the audio, keyframe, demux and
+    rendition stages). Child time is process-wide: when stages run concurrently (see
+    videos/stage_graph.py), a stage can also be charged for another stage's ffmpeg.
+
+    Usage:
+        with track_stage(video, 'transcribe') as stats:
+            ...
+            stats.add(bytes_in=size)
+    """
+    from .models import ProcessingMetric
+
+    stats = StageStats()
+    previous = getattr(_local, 'stats', None)
+    _local.stats = stats
+
+    started_at = timezone.now()
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    children_start = _children_cpu_time()
+    succeeded = False
+    try:
+        yield stats
+        succeeded = True
+    finally:
+        _local.stats = previous
+        try:
+            ProcessingMetric.objects.create(
+                video_id=video.id,
+                stage=stage,
+                started_at=started_at,
+                succeeded=succeeded,
+                wall_time=time.perf_counter() - wall_start,
+                cpu_time=time.thread_time() - cpu_start + _children_cpu_time() - children_start,
+                **{name: getattr(stats, name) for name in COUNTERS},
+            )
+        except Exception as e:
+            # Metrics must never break ingest
+            print(f"Error recording {stage} metrics for video {video.id}: {str(e)}")
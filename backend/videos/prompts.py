@@ -0,0 +1,164 @@
+"""
+Prompt assembly for answer_question.
+
+Messages are ordered so the static part forms a stable prefix that provider-side
+prompt caching can reuse across questions and videos:
+
+    system:    base rules + mode instructions + formatting rules   (static per mode)
+    history:   previous turns, de-duplicated, within a token budget
+    user:      video title + retrieved context + current question  (dynamic)
+"""
+from django.conf import settings
+
+SYSTEM_BASE = """You are a helpful assistant that answers questions about video content.
+You must ONLY use information explicitly stated in the provided context - do not use your general knowledge or training data about the topic.
+Pay attention to timestamps in the context to understand where content appears."""
+
+MODE_CONFIG = {
+    'both': {
+        'label': "Context from the video (transcript + visual):",
+        'instructions': """- Use the video transcript AND visual context as your primary sources - do not add examples or information not present in the video
+- When the user asks about something shown on screen (equations, code, diagrams), use the "On screen" visual content
+- When the user asks what was said, use the "Spoken" transcription content
+- Visual content is especially useful for exact equations, code, and diagrams
+- When the user asks what the video says or requests clarification, provide the information from the transcript and visual context as necessary
+- When the user needs help applying concepts (calculations, derivations, explanations), use what's taught in the video and visual context to help them""",
+    },
+    'visual': {
+        'label': "Visual context from the video (with timestamps):",
+        'instructions': """- Use the visual context as your primary source - do not add examples or information not present in the video
+- When the user asks about something shown on screen, use the "On screen" visual content
+- When the user asks what the video shows or requests clarification, provide the information from the visual context
+- When the user needs help applying concepts (calculations, derivations, explanations), use what's shown in the video to help them
+- Note: This video only has visual analysis available, no audio transcript""",
+    },
+    'audio': {
+        'label': "Context from the video transcript (with timestamps):",
+        'instructions': """- Use the video transcript as your primary source - do not add examples or information not present in the video
+- When the user asks what was said, use the "Spoken" transcription content
+- When the user asks what the video says or requests clarification, provide the information from the transcript
+- When the user needs help applying concepts (calculations, derivations, explanations), use what's taught in the video to help them
+- Note: This video only has audio/transcript analysis available, no visual content""",
+    },
+}
+
+COMMON_INSTRUCTIONS = """- Use proper formatting:
+  * For equations, use LaTeX with single $ for inline math (e.g., $x^2$) and double $$ for block equations
+  * For code, use triple backticks with language identifier (e.g., ```python)
+- Be direct and conversational - skip formal introductions like "In the video..." or "The video mentions..."
+- Use conversation history to understand the full context:
+  * Recognize when the user is correcting or clarifying their previous question
+  * Understand temporal references (early in video = low timestamps, end = high timestamps)
+  * Follow up naturally on previous answers when asked
+- If the context doesn't contain enough information, say so clearly
+- Do NOT mention timestamps or time ranges in your answer - they are displayed separately by the UI"""
+
+_encoding = None
+
+def _get_encoding():
+    """The tiktoken encoding, or False when tiktoken (or its encoding file) is unavailable."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding('o200k_base')
+        except Exception:
+            _encoding = False
+    return _encoding
+
+def estimate_tokens(text):
+    """
+    Count tokens with tiktoken when it is installed, otherwise estimate
+    (~4 characters per token for English text).
+    """
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+def truncate_to_tokens(text, max_tokens):
+    """
+    Cut text down to max_tokens (counted like estimate_tokens), on a word boundary.
+    With tiktoken the cut is made on the tokens; otherwise at ~4 characters per token.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    suffix = ' ...'
+    keep = max(max_tokens - estimate_tokens(suffix), 1)
+    encoding = _get_encoding()
+    if encoding:
+        cut = encoding.decode(encoding.encode(text, disallowed_special=())[:keep])
+    else:
+        cut = text[:keep * 4]
+    return cut.rsplit(' ', 1)[0] + suffix
+
+def system_prompt(mode):
+    """Static system prompt for a mode; identical for every question so it caches well."""
+    config = MODE_CONFIG[mode]
+    return f"{SYSTEM_BASE}\n\nInstructions:\n{config['instructions']}\n{COMMON_INSTRUCTIONS}"
+
+def fit_context(context_texts, max_tokens):
+    """
+    Keep the most relevant context blocks (in the given order) that fit the token budget.
+    The first block is always kept, truncated if it alone exceeds the budget.
+    """
+    kept = []
+    used = 0
+    for text in context_texts:
+        cost = estimate_tokens(text)
+        if used + cost > max_tokens:
+            if not kept:
+                kept.append(truncate_to_tokens(text, max_tokens))
+            break
+        kept.append(text)
+        used += cost
+    return kept
+
+def dedupe_history(history, max_tokens):
+    """
+    Drop empty, non-chat and repeated messages (e.g. the same question re-asked after
+    an error), then keep the newest ones that fit the token budget.
+    """
+    cleaned = []
+    seen = set()
+    for msg in reversed(history or []):
+        role, content = msg.get('role'), (msg.get('content') or '').strip()
+        if role not in ('user', 'assistant') or not content or (role, content) in seen:
+            continue
+        seen.add((role, content))
+        cleaned.append({'role': role, 'content': content})
+
+    kept = []
+    used = 0
+    for msg in cleaned:
+        cost = estimate_tokens(msg['content'])
+        if used + cost > max_tokens:
+            break
+        kept.append(msg)
+        used += cost
+    kept.reverse()
+    return kept
+
+def build_messages(mode, video_title, context_texts, question, history=None):
+    """
+    Assemble the chat messages for answer_question.
+
+    Args:
+        mode: 'audio', 'visual' or 'both'
+        video_title: Title of the video
+        context_texts: Retrieved context blocks, most relevant first
+        question: Current question
+        history: Previous {'role', 'content'} messages, oldest first
+
+    Returns:
+        List of chat messages
+    """
+    messages = [{"role": "system", "content": system_prompt(mode)}]
+    messages.extend(dedupe_history(history, settings.CHAT_HISTORY_TOKEN_BUDGET))
+
+    context = "\n\n".join(fit_context(context_texts, settings.ASK_CONTEXT_TOKEN_BUDGET))
+    messages.append({
+        "role": "user",
+        "content": f"Video: {video_title}\n\n{MODE_CONFIG[mode]['label']}\n{context}\n\nQuestion: {question}",
+    })
+    return messages
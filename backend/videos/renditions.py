@@ -0,0 +1,99 @@
+import json
+import os
+import subprocess
+from django.conf import settings
+
+# Containers/codecs browsers can play directly once the moov atom is moved to the front
+WEB_CONTAINERS = ('mp4', 'mov', 'm4a', '3gp')
+WEB_VIDEO_CODECS = ('h264',)
+WEB_AUDIO_CODECS = ('aac', 'mp3')
+
+def probe_media(path):
+    """
+    Inspect a media file with ffprobe.
+
+    Returns:
+        Dict with format_name, video (codec, width, height) and audio (codec) - either may be None
+    """
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-show_format', '-show_streams', '-of', 'json', path],
+        capture_output=True, text=True, check=True
+    )
+    info = json.loads(result.stdout)
+
+    video_stream = next((s for s in info.get('streams', []) if s.get('codec_type') == 'video'
+                         and not s.get('disposition', {}).get('attached_pic')), None)
+    audio_stream = next((s for s in info.get('streams', []) if s.get('codec_type') == 'audio'), None)
+
+    return {
+        'format_name': info.get('format', {}).get('format_name', ''),
+        'duration': float(info.get('format', {}).get('duration') or 0),
+        'video': {
+            'codec': video_stream.get('codec_name'),
+            'width': video_stream.get('width'),
+            'height': video_stream.get('height'),
+        } if video_stream else None,
+        'audio': {'codec': audio_stream.get('codec_name')} if audio_stream else None,
+    }
+
+def _run_ffmpeg(args):
+    result = subprocess.run(['ffmpeg', '-y', '-v', 'error', *args], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.strip()[-500:]}")
+
+def create_faststart_rendition(video_path, output_dir=None):
+    """
+    Produce a web-friendly MP4 with the moov atom at the front.
+
+    Files that are already H.264/AAC in an MP4-family container are only remuxed
+    (no re-encode); anything else (MKV, AVI, VP9, ...) is transcoded to H.264/AAC.
+
+    Returns:
+        Path of the rendition relative to MEDIA_ROOT, or None if the file has no video stream
+    """
+    output_dir = output_dir or os.path.join(settings.MEDIA_ROOT, 'playback')
+    os.makedirs(output_dir, exist_ok=True)
+
+    probe = probe_media(video_path)
+    if not probe['video']:
+        return None
+
+    stem = os.path.splitext(os.path.basename(video_path))[0]
+    output_path = os.path.join(output_dir, f'{stem}.mp4')
+
+    containers = probe['format_name'].split(',')
+    can_remux = (
+        any(c in WEB_CONTAINERS for c in containers)
+        and probe['video']['codec'] in WEB_VIDEO_CODECS
+        and (probe['audio'] is None or probe['audio']['codec'] in WEB_AUDIO_CODECS)
+    )
+
+    if can_remux:
+        codec_args = ['-c', 'copy']
+    else:
+        codec_args = [
+            '-c:v', 'libx264', '-preset', settings.PLAYBACK_X264_PRESET, '-crf', '23',
+            '-pix_fmt', 'yuv420p', '-c:a', 'aac', '-b:a', '128k',
+        ]
+
+    _run_ffmpeg([
+        '-i', video_path, '-map', '0:v:0', '-map', '0:a:0?', *codec_args,
+        '-movflags', '+faststart', output_path
+    ])
+
+    return os.path.relpath(output_path, settings.MEDIA_ROOT)
+
+def create_playback_renditions(video):
+    """
+    Generate the playback renditions configured by PLAYBACK_RENDITIONS for a video.
+    'off' does nothing, 'faststart' builds an MP4 rendition.
+    """
+    from .persistence import update_video
+
+    mode = settings.PLAYBACK_RENDITIONS
+    if mode == 'off' or not video.file:
+        return
+
+    playback_path = create_faststart_rendition(video.file.path)
+    if playback_path:
+        update_video(video, playback_file=playback_path)
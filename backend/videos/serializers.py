@@ -1,21 +1,46 @@
+import os
 from rest_framework import serializers
-from .models import Video
+from .models import Video, ProcessingMetric
+from .captions import parse_captions
 
 class VideoSerializer(serializers.ModelSerializer):
     """Serializer for the Video model."""
 
+    searchable_ranges = serializers.JSONField(read_only=True)
+
     class Meta:
         model = Video
-        fields = ['id', 'title', 'file', 'youtube_url', 'audio_file', 'status', 'processing_mode', 'transcript_data', 'error_message', 'created_at']
-        read_only_fields = ['id', 'status', 'audio_file', 'transcript_data', 'error_message', 'created_at']
+        fields = ['id', 'title', 'file', 'youtube_url', 'caption_file', 'audio_file', 'playback_file', 'sprite_index', 'status', 'processing_mode', 'transcription_backend', 'transcript_data', 'error_message', 'searchable_ranges', 'stage_status', 'frame_analysis_stats', 'created_at']
+        read_only_fields = ['id', 'status', 'audio_file', 'playback_file', 'sprite_index', 'transcript_data', 'error_message', 'stage_status', 'frame_analysis_stats', 'created_at']
+
+    def validate_caption_file(self, value):
+        """Reject caption files that don't parse into any cues."""
+        if value is None:
+            return value
+        fmt = os.path.splitext(value.name)[1].lstrip('.').lower()
+        try:
+            segments = parse_captions(value.read().decode('utf-8-sig', errors='replace'), fmt)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        finally:
+            value.seek(0)
+        if not segments:
+            raise serializers.ValidationError("Caption file has no cues.")
+        return value
 
     def to_representation(self, instance):
         """Override to return relative URLs and normalize status for frontend."""
         data = super().to_representation(instance)
         if instance.file:
             data['file'] = instance.file.url
+        if instance.caption_file:
+            data['caption_file'] = instance.caption_file.url
         if instance.audio_file:
             data['audio_file'] = instance.audio_file.url
+        if instance.playback_file:
+            data['playback_file'] = instance.playback_file.url
+        if instance.sprite_index:
+            data['sprite_index'] = instance.sprite_index.url
         # Map internal statuses to frontend-friendly values
         if data['status'] not in ('ready', 'failed'):
             data['status'] = 'processing'
@@ -28,14 +53,17 @@ class QuerySerializer(serializers.Serializer):
         required=True,
         help_text="The question to ask about the video"
     )
-    conversation_history = serializers.ListField(
-        child=serializers.DictField(),
-        required=False,
-        default=list,
-        help_text="Previous conversation messages for context"
-    )
     max_distance = serializers.FloatField(
         required=False,
         default=1.5,
         help_text="Maximum distance threshold for considering relevant results"
     )
+
+
+class ProcessingMetricSerializer(serializers.ModelSerializer):
+    """Serializer for per-stage processing metrics."""
+
+    class Meta:
+        model = ProcessingMetric
+        fields = ['id', 'video', 'stage', 'started_at', 'succeeded', 'wall_time', 'cpu_time', 'bytes_in',
+                  'bytes_out', 'api_calls', 'tokens', 'frames_decoded', 'frames_kept']
@@ -0,0 +1,97 @@
+"""
+Dependency-graph runner for ingest stages.
+
+process_video declares its stages (transcribe -> chunk, extract_keyframes ->
+analyze_frames) with the stages each one comes after; independent branches then run
+in parallel threads, so the network-bound Whisper call overlaps the CPU-bound
+keyframe scan and ingest takes about as long as the longer branch.
+
+Progress is written to Video.stage_status ({stage: 'pending' | 'running' | 'done' |
+'failed' | 'skipped'}), and Video.status follows the most recently started stage.
+"""
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from django.db import connections
+from .persistence import update_video
+
+class Stage:
+    """
+    One step of the pipeline.
+
+    Args:
+        name: Key in Video.stage_status and in the results passed to later stages
+        run: Callable taking the dict of finished stages' return values
+        after: Names of stages that must finish first
+        status: Video.status to show while this stage runs
+    """
+
+    def __init__(self, name, run, after=(), status=None):
+        self.name = name
+        self.run = run
+        self.after = tuple(after)
+        self.status = status
+
+def run_stages(video, stages, max_workers=None):
+    """
+    Run each stage once the stages it comes after are done, up to `max_workers` at a
+    time (max_workers=1 runs them one after another, in declaration order).
+
+    If a stage fails, no further stages start; running ones finish, the rest are
+    marked skipped and the first error is raised.
+
+    Returns:
+        Dict of stage name -> return value of its run callable
+    """
+    names = [stage.name for stage in stages]
+    for stage in stages:
+        unknown = set(stage.after) - set(names)
+        if unknown:
+            raise ValueError(f"Stage {stage.name} comes after unknown stages: {', '.join(sorted(unknown))}")
+
+    state = {name: 'pending' for name in names}
+    lock = threading.Lock()
+    results = {}
+
+    def publish(name, value, **fields):
+        # One writer at a time, so concurrent branches never overwrite each other's progress
+        with lock:
+            state[name] = value
+            update_video(video, stage_status=dict(state), **fields)
+
+    def execute(stage):
+        try:
+            publish(stage.name, 'running', **({'status': stage.status} if stage.status else {}))
+            return stage.run(results)
+        finally:
+            # Connections opened by this worker thread would otherwise stay open
+            connections.close_all()
+
+    update_video(video, stage_status=dict(state))
+    pending = list(stages)
+    running = {}
+    error = None
+    with ThreadPoolExecutor(max_workers=max_workers or len(stages)) as pool:
+        while True:
+            if error is None:
+                for stage in [s for s in pending if all(state[name] == 'done' for name in s.after)]:
+                    pending.remove(stage)
+                    running[pool.submit(execute, stage)] = stage
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    results[stage.name] = future.result()
+                    publish(stage.name, 'done')
+                except Exception as e:
+                    publish(stage.name, 'failed')
+                    error = error or e
+
+    for stage in pending:
+        publish(stage.name, 'skipped')
+    if error is not None:
+        raise error
+    if pending:
+        raise ValueError(f"Stages in a dependency cycle: {', '.join(stage.name for stage in pending)}")
+    return results
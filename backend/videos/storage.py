@@ -0,0 +1,198 @@
+"""
+Media storage lifecycle.
+
+- Intermediates: the MP3 extracted for transcription is deleted once a video is ready
+  (STORAGE_DELETE_AUDIO_AFTER_READY); `manage.py cleanup_media` ages out any kept ones.
+- Deletion: when a Video row is deleted its files go too, unless another row still
+  references them.
+- Dedup: a user's uploads with the same content hash share one stored file. Dedup is
+  per user, so no one's storage or quota depends on another user's files.
+- Quotas: STORAGE_USER_QUOTA_MB caps the original media each user stores, counting
+  each stored file once; it applies to uploads, YouTube downloads and bulk ingest.
+
+Several rows can point at the same file (dedup), so files are only ever deleted
+after checking that no other row references them.
+"""
+import hashlib
+import os
+import shutil
+import time
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Q
+
+# Video fields that point at files under MEDIA_ROOT
+FILE_FIELDS = ('file', 'audio_file', 'caption_file', 'playback_file', 'sprite_index')
+
+# MEDIA_ROOT subdirectories managed by the pipeline (scanned for orphans)
+MEDIA_DIRS = ('videos', 'audio', 'captions', 'playback')
+
+# MEDIA_ROOT subdirectories with one <video id>/ directory per video (thumbnails, sprites)
+VIDEO_DIRS = ('frames', 'sprites')
+
+class QuotaExceeded(Exception):
+    """Raised when storing a file would put a user over STORAGE_USER_QUOTA_MB."""
+
+def hash_upload(uploaded_file):
+    """SHA-256 hex digest of an uploaded file, read in chunks; rewinds the file afterwards."""
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+def find_stored_blob(content_hash, user):
+    """Name of a file with this content hash already stored by `user`, or None."""
+    from .models import Video
+
+    if not content_hash:
+        return None
+    names = (Video.objects.filter(user=user, content_hash=content_hash)
+             .exclude(Q(file='') | Q(file__isnull=True))
+             .values_list('file', flat=True).distinct())
+    for name in names:
+        if default_storage.exists(name):
+            return name
+    return None
+
+def storage_used(user):
+    """Bytes of original media stored by a user; a file shared by several rows counts once."""
+    from .models import Video
+
+    sizes = dict(Video.objects.filter(user=user).exclude(Q(file='') | Q(file__isnull=True))
+                 .values_list('file', 'file_size'))
+    return sum(size or 0 for size in sizes.values())
+
+def quota_bytes():
+    """Per-user storage quota in bytes, or None when unlimited."""
+    return settings.STORAGE_USER_QUOTA_MB * 1024 * 1024 if settings.STORAGE_USER_QUOTA_MB else None
+
+def check_quota(user, incoming_bytes, pending_bytes=0):
+    """
+    Raise QuotaExceeded if storing `incoming_bytes` more would exceed the user's quota.
+    `pending_bytes` counts files already accepted whose rows aren't saved yet (bulk ingest).
+    """
+    quota = quota_bytes()
+    if quota is None or user is None:
+        return
+    used = storage_used(user) + pending_bytes
+    if used + incoming_bytes > quota:
+        raise QuotaExceeded(
+            f"Storage quota exceeded: {used / 1e6:.0f} MB of {quota / 1e6:.0f} MB used, "
+            f"this video needs {incoming_bytes / 1e6:.0f} MB more."
+        )
+
+def is_referenced(name, exclude_id=None):
+    """Whether any Video row (other than `exclude_id`) points at this file."""
+    from .models import Video
+
+    # Per-video directories belong to the video with that id
+    top, _, video_id = name.partition('/')
+    if top in VIDEO_DIRS and video_id.isdigit():
+        return Video.objects.filter(id=int(video_id)).exclude(id=exclude_id).exists()
+
+    query = Q()
+    for field in FILE_FIELDS:
+        query |= Q(**{field: name})
+    return Video.objects.filter(query).exclude(id=exclude_id).exists()
+
+def _directory_size(path):
+    return sum(os.path.getsize(os.path.join(dirpath, filename))
+               for dirpath, _, filenames in os.walk(path) for filename in filenames)
+
+def _delete_name(name):
+    """Delete a stored file or directory; returns bytes freed."""
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    if os.path.isdir(path):
+        freed = _directory_size(path)
+        shutil.rmtree(path, ignore_errors=True)
+        return freed
+    if not os.path.isfile(path):
+        return 0
+    freed = os.path.getsize(path)
+    default_storage.delete(name)
+    # Per-video subdirectories (audio/<video id>/) go with their last file
+    if '/' in os.path.dirname(name):
+        try:
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            pass
+    return freed
+
+def delete_unreferenced(names, exclude_id=None):
+    """Delete each file that no other Video row references; returns bytes freed."""
+    freed = 0
+    for name in names:
+        if not name or is_referenced(name, exclude_id=exclude_id):
+            continue
+        try:
+            freed += _delete_name(name)
+        except OSError as e:
+            print(f"Error deleting {name}: {str(e)}")
+    return freed
+
+def delete_intermediates(video):
+    """
+    Drop files only needed during processing (the extracted MP3), once the video is ready.
+    Returns bytes freed.
+    """
+    from .persistence import update_video
+
+    if not settings.STORAGE_DELETE_AUDIO_AFTER_READY or not video.audio_file:
+        return 0
+    name = video.audio_file.name
+    update_video(video, audio_file=None)
+    return delete_unreferenced([name], exclude_id=video.id)
+
+def video_file_names(video):
+    """Names of the files a video points at."""
+    return [getattr(video, field).name for field in FILE_FIELDS if getattr(video, field)]
+
+def delete_video_dirs(video_id, tops=VIDEO_DIRS):
+    """Delete a video's per-video directories (frame thumbnails, sprites); returns bytes freed."""
+    freed = 0
+    for top in tops:
+        directory = os.path.join(settings.MEDIA_ROOT, top, str(video_id))
+        if os.path.isdir(directory):
+            freed += _directory_size(directory)
+            shutil.rmtree(directory, ignore_errors=True)
+    return freed
+
+def delete_video_files(video_id, names):
+    """Delete a deleted video's files that no remaining row references."""
+    freed = delete_unreferenced(names, exclude_id=video_id) + delete_video_dirs(video_id)
+    if freed:
+        print(f"Deleted {freed / 1e6:.1f} MB of media for video {video_id}")
+
+def find_orphans(min_age_seconds=24 * 3600):
+    """
+    Files under the managed MEDIA_ROOT directories that no Video row references,
+    older than `min_age_seconds` (so uploads and running ingests are left alone).
+
+    Returns:
+        List of (name relative to MEDIA_ROOT, size in bytes)
+    """
+    cutoff = time.time() - min_age_seconds
+    orphans = []
+    for top in VIDEO_DIRS:
+        root = os.path.join(settings.MEDIA_ROOT, top)
+        if not os.path.isdir(root):
+            continue
+        for entry in os.scandir(root):
+            name = f'{top}/{entry.name}'
+            if entry.is_dir() and entry.stat().st_mtime <= cutoff and not is_referenced(name):
+                orphans.append((name, _directory_size(entry.path)))
+    for top in MEDIA_DIRS:
+        root = os.path.join(settings.MEDIA_ROOT, top)
+        if not os.path.isdir(root):
+            continue
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                stat = os.stat(path)
+                if stat.st_mtime > cutoff:
+                    continue
+                name = os.path.relpath(path, settings.MEDIA_ROOT)
+                if not is_referenced(name):
+                    orphans.append((name, stat.st_size))
+    return orphans
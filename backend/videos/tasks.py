@@ -1,90 +1,246 @@
-from .models import Video, TranscriptChunk
-from .utils import transcribe_video, chunk_transcript
+import os
+from django.conf import settings
+from .models import Video
+from .utils import audio_output_path, extract_audio, StreamingChunker
+from .transcription import get_transcriber
 import traceback
-from .youtube_utils import download_youtube_video, get_youtube_metadata
-from .embeddings import model
-from .vision_utils import process_video_frames
+from .youtube_utils import download_youtube_video, download_youtube_captions, get_youtube_metadata
+from .captions import parse_caption_file, captions_usable
+from .embeddings import encode
+from .vision_utils import scan_keyframes, analyze_keyframes
+from .demux import scan_media
+from .renditions import create_playback_renditions, probe_media
+from .thumbnails import build_sprite_sheet
+from .persistence import update_video, set_status, save_chunks
+from .pipeline_metrics import track_stage
+from .stage_graph import Stage, run_stages
+from .storage import QuotaExceeded, check_quota, delete_intermediates, delete_unreferenced
+
+# Transcript segments are chunked and published this many at a time
+PUBLISH_BATCH_SEGMENTS = 64
+
+def chunk_and_publish(video, segments):
+    """
+    Chunk, embed and store transcript segments incrementally.
+
+    Each batch of finished chunks is committed as soon as it is embedded and
+    audio_searchable_until is advanced, so questions can be asked about the
+    start of the video while the rest is still being processed.
+
+    Returns:
+        Number of chunks created
+    """
+    chunker = StreamingChunker(min_duration=15, max_duration=90, similarity_threshold=0.70)
+    next_chunk_id = 0
+
+    def publish(chunks):
+        nonlocal next_chunk_id
+        if not chunks:
+            return
+        chunk_embeddings = encode([chunk['text'] for chunk in chunks], 'chunks', show_progress_bar=False)
+        save_chunks(video, chunks, chunk_embeddings, first_chunk_id=next_chunk_id)
+        next_chunk_id += len(chunks)
+        update_video(video, audio_searchable_until=chunks[-1]['end'])
+
+    for i in range(0, len(segments), PUBLISH_BATCH_SEGMENTS):
+        publish(chunker.feed(segments[i:i + PUBLISH_BATCH_SEGMENTS]))
+    publish(chunker.flush())
+
+    return next_chunk_id
+
+def audio_dir(video):
+    """
+    Directory a video's extracted MP3 is written to. Per video, because deduplicated
+    rows share one file: named after the file alone, one row's audio could be
+    deleted while another row is still transcribing it.
+    """
+    return os.path.join('media', 'audio', str(video.id))
+
+def demux_video(video):
+    """
+    Decode the video once, writing the audio to transcribe (unless captions are
+    uploaded) and picking keyframe timestamps (see videos/demux.py).
+    """
+    video_path = video.file.path
+    needs_audio = video.processing_mode in ('audio', 'both') and not video.caption_file
+    with track_stage(video, 'demux') as stats:
+        result = scan_media(video_path, audio_output_path(video_path, audio_dir(video)) if needs_audio else None,
+                            scan_fps=settings.PIPELINE_SCAN_FPS, min_interval=10.0)
+        stats.add(bytes_in=os.path.getsize(video_path),
+                  bytes_out=os.path.getsize(result['audio_path']) if result['audio_path'] else 0)
+    return result
+
+def media_duration(video):
+    """
+    Duration of a video's media in seconds: probed from the file, or from the
+    YouTube info before anything is downloaded. None if it can't be determined.
+    """
+    try:
+        if video.file:
+            return probe_media(video.file.path)['duration'] or None
+        if video.youtube_url:
+            return get_youtube_metadata(video.youtube_url)['duration'] or None
+    except Exception as e:
+        print(f"Could not determine duration of video {video.id}: {str(e)}")
+    return None
+
+def transcribe_video(video, openai_key=None, audio_path=None):
+    """
+    Get transcript segments for a video and store them as transcript_data.
+    Usable captions (uploaded or from YouTube) replace audio extraction + transcription;
+    otherwise `audio_path` (already extracted) or a fresh extraction is transcribed.
+    """
+    segments = None
+    if video.caption_file:
+        with track_stage(video, 'captions') as stats:
+            segments = parse_caption_file(video.caption_file.path)
+            stats.add(bytes_in=video.caption_file.size)
+        if not captions_usable(segments, duration=media_duration(video)):
+            print(f"Captions for video {video.id} are not usable, transcribing instead")
+            segments = None
+
+    if segments is not None:
+        # Transcript JSON is written exactly once
+        update_video(video, transcript_data=segments)
+        return segments
+
+    if audio_path is None:
+        with track_stage(video, 'extract_audio') as stats:
+            audio_path = extract_audio(video.file.path, audio_dir(video))
+            stats.add(bytes_in=os.path.getsize(video.file.path), bytes_out=os.path.getsize(audio_path))
+
+    with track_stage(video, 'transcribe') as stats:
+        transcriber = get_transcriber(video.transcription_backend)
+        segments = transcriber.transcribe(audio_path, openai_key=openai_key)
+
+    # Transcript JSON is written exactly once
+    update_video(video, transcript_data=segments, audio_file=audio_path.replace('media/', ''))
+    return segments
+
+def chunk_video(video, segments):
+    """Chunk transcript segments, publishing chunks as they are embedded."""
+    with track_stage(video, 'chunk'):
+        return chunk_and_publish(video, segments)
+
+def pipeline_stages(video, openai_key=None):
+    """
+    Stages for the video's processing_mode. The audio branch (transcribe -> chunk)
+    and the visual branch (keyframe scan -> frame analysis) are independent.
+
+    With PIPELINE_SINGLE_PASS_DEMUX, videos with a visual branch are decoded once by a
+    'demux' stage that both branches come after: it writes the audio and picks the
+    keyframe timestamps, so the visual branch only decodes the chosen frames.
+    """
+    single_pass = settings.PIPELINE_SINGLE_PASS_DEMUX and video.processing_mode in ('visual', 'both')
+    demux = ['demux'] if single_pass else []
+
+    stages = []
+    if single_pass:
+        stages.append(Stage('demux', lambda results: demux_video(video),
+                            status='transcribing' if video.processing_mode == 'both' else 'scanning'))
+    if video.processing_mode in ('audio', 'both'):
+        stages += [
+            Stage('transcribe', lambda results: transcribe_video(video, openai_key, results.get('demux', {}).get('audio_path')),
+                  after=demux, status='transcribing'),
+            Stage('chunk', lambda results: chunk_video(video, results['transcribe']),
+                  after=['transcribe'], status='chunking'),
+        ]
+    if video.processing_mode in ('visual', 'both'):
+        stages += [
+            Stage('extract_keyframes', lambda results: scan_keyframes(video, results.get('demux', {}).get('timestamps')),
+                  after=demux, status='scanning'),
+            Stage('analyze_frames', lambda results: analyze_keyframes(video, results['extract_keyframes'], openai_key),
+                  after=['extract_keyframes'], status='scanning'),
+        ]
+    return stages
 
 def process_video(video_id, openai_key=None):
     """
     Background task to process a video.
     Updates video status as it progresses.
-    Respects processing_mode: 'audio', 'visual', or 'both'.
+    Respects processing_mode: 'audio', 'visual', or 'both'; in 'both' mode the audio
+    and visual branches run concurrently (PIPELINE_CONCURRENT_BRANCHES).
     """
     try:
-        video = Video.objects.get(id=video_id)
+        # Status changes below are narrow updates, so the transcript JSON is never loaded or rewritten
+        video = Video.objects.defer('transcript_data').get(id=video_id)
         mode = video.processing_mode
 
-        # Audio processing (transcribe + chunk)
-        if mode in ('audio', 'both'):
-            video.status = 'transcribing'
-            video.save()
-            segments, audio_path = transcribe_video(video.file.path, openai_key=openai_key)
-
-            video.transcript_data = segments
-            video.audio_file = audio_path.replace('media/', '')
-            video.save()
-
-            video.status = 'chunking'
-            video.save()
-
-            # Chunk transcript
-            chunks = chunk_transcript(segments, min_duration=15, max_duration=90, similarity_threshold=0.70)
-
-            # Generate embeddings for all chunks at once (batch processing)
-            chunk_texts = [chunk['text'] for chunk in chunks]
-            chunk_embeddings = model.encode(chunk_texts, show_progress_bar=False)
-
-            for idx, chunk in enumerate(chunks):
-                TranscriptChunk.objects.create(
-                    video=video,
-                    chunk_id=idx,
-                    text=chunk['text'],
-                    start_time=chunk['start'],
-                    end_time=chunk['end'],
-                    segments=chunk.get('segments', []),
-                    embedding=chunk_embeddings[idx].tolist()
-                )
-
-        # Visual processing
-        if mode in ('visual', 'both'):
-            video.status = 'scanning'
-            video.save()
-            process_video_frames(video, openai_key=openai_key)
-
-        video.status = 'ready'
-        video.save()
+        run_stages(video, pipeline_stages(video, openai_key=openai_key),
+                   max_workers=None if settings.PIPELINE_CONCURRENT_BRANCHES else 1)
+
+        set_status(video, 'ready')
 
         print(f"Video {video_id} processed successfully! (mode: {mode})")
 
+        # Playback renditions are optional: the video is already usable, so failures only get logged
+        try:
+            with track_stage(video, 'renditions'):
+                create_playback_renditions(video)
+        except Exception as e:
+            print(f"Error creating playback renditions for video {video_id}: {str(e)}")
+
+        # Timeline sprite of the keyframe thumbnails; also optional
+        if mode in ('visual', 'both') and settings.FRAME_THUMBNAILS_ENABLED:
+            try:
+                with track_stage(video, 'sprites'):
+                    build_sprite_sheet(video, duration=probe_media(video.file.path)['duration'])
+            except Exception as e:
+                print(f"Error building sprite sheet for video {video_id}: {str(e)}")
+
+        # The extracted audio was only needed for transcription
+        delete_intermediates(video)
+
     except Exception as e:
         print(f"Error processing video {video_id}: {str(e)}")
         traceback.print_exc()
 
-        video.status = 'failed'
-        video.error_message = str(e)
-        video.save()
+        set_status(video, 'failed', error_message=str(e))
 
 def process_youtube_video(video_id, openai_key=None):
     """
     Background task to download and process a YouTube video.
     """
     try:
-        video = Video.objects.get(id=video_id)
+        video = Video.objects.defer('transcript_data').get(id=video_id)
 
         # Update status
-        video.status = 'downloading'
-        video.save()
-
-        # Download YouTube video (only what's needed based on processing mode)
-        print(f"Downloading YouTube video: {video.youtube_url} (mode: {video.processing_mode})")
-        video_file_path = download_youtube_video(video.youtube_url, video_id, video.processing_mode)
-
-        # Save downloaded file path to video object
-        video.file = video_file_path
-        video.save()
-
-        print(f"Downloaded YouTube video to: {video_file_path}")
+        set_status(video, 'downloading')
+
+        # Existing captions make transcription (and, for audio-only videos, the download) unnecessary
+        if video.processing_mode in ('audio', 'both') and not video.caption_file and settings.YOUTUBE_CAPTIONS_ENABLED:
+            try:
+                with track_stage(video, 'fetch_captions'):
+                    caption_path = download_youtube_captions(video.youtube_url, video_id)
+            except Exception as e:
+                print(f"{str(e)}; falling back to transcription")
+                caption_path = None
+            if caption_path:
+                update_video(video, caption_file=caption_path)
+                print(f"Using YouTube captions: {caption_path}")
+
+        if video.processing_mode == 'audio' and video.caption_file and \
+                captions_usable(parse_caption_file(video.caption_file.path), duration=media_duration(video)):
+            print(f"Skipping media download for YouTube video {video_id}: captions cover the audio")
+        else:
+            # Download YouTube video (only what's needed based on processing mode)
+            print(f"Downloading YouTube video: {video.youtube_url} (mode: {video.processing_mode})")
+            with track_stage(video, 'download') as stats:
+                video_file_path = download_youtube_video(video.youtube_url, video_id, video.processing_mode)
+                file_size = os.path.getsize(os.path.join(settings.MEDIA_ROOT, video_file_path))
+                stats.add(bytes_in=file_size)
+
+            # The size is only known after downloading; over quota, the file is not kept
+            try:
+                check_quota(video.user, file_size)
+            except QuotaExceeded:
+                delete_unreferenced([video_file_path])
+                raise
+
+            # Save downloaded file path to video object
+            update_video(video, file=video_file_path, file_size=file_size)
+
+            print(f"Downloaded YouTube video to: {video_file_path}")
 
         # Proceed with normal processing
         process_video(video_id, openai_key=openai_key)
@@ -93,6 +249,4 @@ def process_youtube_video(video_id, openai_key=None):
         print(f"Error processing YouTube video {video_id}: {str(e)}")
         traceback.print_exc()
 
-        video.status = 'failed'
-        video.error_message = str(e)
-        video.save()
\ No newline at end of file
+        set_status(video, 'failed', error_message=str(e))
\ No newline at end of file
@@ -1,3 +1,426 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import zlib
+import cv2
+from unittest import mock, skipUnless
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from . import onnx_embeddings
+from .captions import captions_usable, parse_caption_file, parse_captions
+from .demux import SCAN_HEIGHT, SCAN_WIDTH, detect_changes
+from .models import Video
+from .prompts import estimate_tokens, truncate_to_tokens
+from .stage_graph import Stage, run_stages
+from .tasks import PUBLISH_BATCH_SEGMENTS, process_youtube_video
+from .utils import StreamingChunker, chunk_transcript
+from .vision_utils import extract_keyframes
 
-# Create your tests here.
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+CAPTION_FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'captions')
+
+def fixture_path(name):
+    return os.path.join(CAPTION_FIXTURES, name)
+
+def fake_encode(texts, kind, **kwargs):
+    """Stand-in for embeddings.encode: the same unit vector for every text."""
+    if isinstance(texts, str):
+        return np.ones(8, dtype='float32')
+    return np.ones((len(texts), 8), dtype='float32')
+
+def topic_encode(texts, kind, **kwargs):
+    """
+    Stand-in for embeddings.encode: texts starting with the same 'topicN' word point the
+    same way, with a little per-text noise, so similarities fall on both sides of 0.70.
+    """
+    vectors = []
+    for text in texts:
+        topic = int(text.split()[0][len('topic'):])
+        vector = np.random.default_rng(zlib.crc32(text.encode())).normal(0, 0.12, 16)
+        vector[topic % 16] += 1.0
+        vectors.append(vector)
+    return np.array(vectors, dtype='float32')
+
+def baseline_chunk_transcript(segments, embeddings, min_duration=15, max_duration=90, similarity_threshold=0.70):
+    """The original all-at-once chunk_transcript, given the segments' embeddings."""
+    if not segments:
+        return []
+    segment_embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    chunks = []
+    current_chunk = {'text': '', 'start': None, 'end': None, 'anchor_embedding': None, 'segments': []}
+    for i, seg in enumerate(segments):
+        if current_chunk['start'] is None:
+            current_chunk['start'] = seg['start']
+            current_chunk['text'] = seg['text'] + ' '
+            current_chunk['end'] = seg['end']
+            current_chunk['anchor_embedding'] = segment_embeddings[i]
+            current_chunk['segments'].append(seg)
+            continue
+
+        chunk_duration = current_chunk['end'] - current_chunk['start']
+        seg_embedding = segment_embeddings[i]
+        similarity = np.dot(current_chunk['anchor_embedding'], seg_embedding)
+
+        should_start_new_chunk = False
+        if chunk_duration >= max_duration:
+            should_start_new_chunk = True
+        elif chunk_duration >= min_duration and similarity < similarity_threshold:
+            should_start_new_chunk = True
+
+        if should_start_new_chunk:
+            chunks.append({'text': current_chunk['text'].strip(), 'start': current_chunk['start'],
+                           'end': current_chunk['end'], 'segments': current_chunk['segments'].copy()})
+            current_chunk = {'text': seg['text'] + ' ', 'start': seg['start'], 'end': seg['end'],
+                             'anchor_embedding': seg_embedding, 'segments': [seg]}
+        else:
+            current_chunk['text'] += seg['text'] + ' '
+            current_chunk['end'] = seg['end']
+            current_chunk['segments'].append(seg)
+
+    if current_chunk['segments']:
+        chunks.append({'text': current_chunk['text'].strip(), 'start': current_chunk['start'],
+                       'end': current_chunk['end'], 'segments': current_chunk['segments']})
+    return chunks
+
+@mock.patch('videos.embeddings.encode', side_effect=topic_encode)
+class StreamingChunkerTests(SimpleTestCase):
+    def setUp(self):
+        # Whisper-style segments: leading spaces, topics of varying length, one long monologue
+        lengths = [3, 9, 1, 14, 6, 40, 2, 11, 5, 25, 7, 30, 4, 18, 9, 13]
+        self.segments = []
+        start = 0.0
+        for topic, length in enumerate(lengths):
+            for i in range(length):
+                duration = 2.5 + (len(self.segments) % 5)
+                self.segments.append({'id': len(self.segments), 'start': start, 'end': start + duration,
+                                      'text': f' topic{topic} sentence {i} of the lecture'})
+                start += duration
+        self.expected = baseline_chunk_transcript(self.segments, topic_encode([s['text'] for s in self.segments], 'transcript'))
+
+    def test_matches_baseline_in_one_batch(self, _encode):
+        self.assertGreater(len(self.expected), 5)
+        self.assertEqual(chunk_transcript(self.segments), self.expected)
+
+    def test_matches_baseline_when_fed_in_publish_batches(self, _encode):
+        for batch_size in (32, 7, 1):
+            with self.subTest(batch_size=batch_size):
+                chunker = StreamingChunker(batch_size=batch_size)
+                chunks = []
+                for i in range(0, len(self.segments), PUBLISH_BATCH_SEGMENTS):
+                    chunks.extend(chunker.feed(self.segments[i:i + PUBLISH_BATCH_SEGMENTS]))
+                chunks.extend(chunker.flush())
+                self.assertEqual(chunks, self.expected)
+
+    def test_empty(self, _encode):
+        self.assertEqual(chunk_transcript([]), [])
+
+class PieceEncoding:
+    """Stand-in for a tiktoken encoding: every 3 characters are one token."""
+
+    def encode(self, text, disallowed_special=()):
+        return [text[i:i + 3] for i in range(0, len(text), 3)]
+
+    def decode(self, tokens):
+        return ''.join(tokens)
+
+class TruncateToTokensTests(SimpleTestCase):
+    text = ' '.join(f'word{i} and some longer vocabulary' for i in range(200))
+
+    def check_within_budget(self):
+        for max_tokens in range(5, 300, 7):
+            with self.subTest(max_tokens=max_tokens):
+                cut = truncate_to_tokens(self.text, max_tokens)
+                self.assertLessEqual(estimate_tokens(cut), max_tokens)
+                self.assertTrue(cut.endswith(' ...'))
+                self.assertTrue(self.text.startswith(cut[:-len(' ...')] + ' '))
+
+    def test_with_tiktoken(self):
+        with mock.patch('videos.prompts._encoding', PieceEncoding()):
+            self.check_within_budget()
+
+    def test_without_tiktoken(self):
+        with mock.patch('videos.prompts._encoding', False):
+            self.check_within_budget()
+
+    def test_short_text_unchanged(self):
+        self.assertEqual(truncate_to_tokens('a short answer', 100), 'a short answer')
+
+@skipUnless(onnxruntime, "onnxruntime is not installed")
+class OnnxEmbeddingsTests(SimpleTestCase):
+    """The exported model at EMBEDDING_ONNX_PATH against the torch embeddings saved with it."""
+
+    def setUp(self):
+        self.model_dir = settings.EMBEDDING_ONNX_PATH
+        if not os.path.exists(os.path.join(self.model_dir, onnx_embeddings.REFERENCE_FILE)):
+            self.skipTest(f"No exported ONNX model in {self.model_dir} "
+                          f"(python videos/onnx_embeddings.py {self.model_dir} --quantize)")
+
+    def test_fp32_matches_torch(self):
+        self.assertGreaterEqual(onnx_embeddings.verify(self.model_dir, quantized=False), onnx_embeddings.MIN_COSINE)
+
+    def test_int8_matches_torch(self):
+        if not os.path.exists(os.path.join(self.model_dir, onnx_embeddings.INT8_FILE)):
+            self.skipTest("No int8 model exported")
+        self.assertGreaterEqual(onnx_embeddings.verify(self.model_dir, quantized=True), onnx_embeddings.MIN_COSINE)
+
+class ParseCaptionsTests(SimpleTestCase):
+    def test_srt(self):
+        segments = parse_caption_file(fixture_path('sample.srt'))
+
+        self.assertEqual([(seg['start'], seg['end']) for seg in segments],
+                         [(1.0, 4.5), (4.5, 9.25), (3610.0, 3615.0)])
+        # Multi-line cues are joined, tags and entities stripped
+        self.assertEqual(segments[0]['text'], 'Welcome to the introduction to linear algebra & geometry.')
+        self.assertEqual(segments[1]['text'], 'Today we look at vectors, matrices and how they transform space.')
+
+    def test_srt_drops_empty_cues(self):
+        segments = parse_caption_file(fixture_path('sample.srt'))
+        self.assertEqual(len(segments), 3)
+        self.assertTrue(all(seg['text'] for seg in segments))
+
+    def test_vtt_rolling_cues_are_merged(self):
+        segments = parse_caption_file(fixture_path('sample.vtt'))
+
+        # Lines repeated from the previous cue are dropped; the repeat-only cue disappears
+        self.assertEqual([seg['text'] for seg in segments],
+                         ['so today we', 'are going to', 'talk about Fourier series', 'and & transforms'])
+        # Overlapping cues end where the next one starts
+        self.assertEqual([(seg['start'], seg['end']) for seg in segments],
+                         [(0.0, 2.0), (2.0, 4.0), (4.0, 7.0), (7.01, 9.0)])
+
+    def test_vtt_ignores_header_style_and_note_blocks(self):
+        segments = parse_caption_file(fixture_path('sample.vtt'))
+        self.assertFalse(any('WEBVTT' in seg['text'] or 'cue' in seg['text'] or 'comment' in seg['text']
+                             for seg in segments))
+
+    def test_json3(self):
+        segments = parse_caption_file(fixture_path('sample.json3'))
+
+        # Window, line-break and blank events are skipped; whitespace collapsed, entities decoded
+        self.assertEqual(segments, [
+            {'id': 0, 'start': 0.5, 'end': 3.0, 'text': 'hello and welcome'},
+            {'id': 1, 'start': 3.0, 'end': 7.0, 'text': 'Q&A starts now'},
+        ])
+
+    def test_segments_match_whisper_format(self):
+        for name in ('sample.srt', 'sample.vtt', 'sample.json3'):
+            segments = parse_caption_file(fixture_path(name))
+            with self.subTest(name=name):
+                self.assertEqual([seg['id'] for seg in segments], list(range(len(segments))))
+                for seg in segments:
+                    self.assertEqual(set(seg), {'id', 'start', 'end', 'text'})
+                    self.assertIsInstance(seg['start'], float)
+                    self.assertLessEqual(seg['start'], seg['end'])
+                self.assertEqual(segments, sorted(segments, key=lambda seg: seg['start']))
+
+    def test_unsupported_format(self):
+        with self.assertRaises(ValueError):
+            parse_captions('', 'ass')
+
+    @mock.patch('videos.embeddings.encode', side_effect=fake_encode)
+    def test_chunk_transcript_accepts_caption_segments(self, _encode):
+        segments = parse_caption_file(fixture_path('sample.srt'))
+
+        chunks = chunk_transcript(segments)
+
+        self.assertEqual([seg for chunk in chunks for seg in chunk['segments']], segments)
+        for chunk in chunks:
+            self.assertEqual(chunk['start'], chunk['segments'][0]['start'])
+            self.assertEqual(chunk['end'], chunk['segments'][-1]['end'])
+            self.assertEqual(chunk['text'], ' '.join(seg['text'] for seg in chunk['segments']))
+
+    def test_captions_usable(self):
+        segments = parse_caption_file(fixture_path('sample.srt'))
+
+        self.assertTrue(captions_usable(segments))
+        self.assertTrue(captions_usable(segments, duration=3620))
+        # Ending at 1:00:15 covers under half of a three-hour video
+        self.assertFalse(captions_usable(segments, duration=3 * 3600))
+        self.assertFalse(captions_usable(parse_caption_file(fixture_path('sample.json3'))))
+        self.assertFalse(captions_usable([]))
+
+class YouTubeCaptionsTests(TransactionTestCase):
+    """process_youtube_video in audio mode; a TransactionTestCase because stages run in worker threads."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, YOUTUBE_CAPTIONS_ENABLED=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user('viewer', password='password')
+        self.video = Video.objects.create(user=self.user, title='Lecture', processing_mode='audio',
+                                          youtube_url='https://www.youtube.com/watch?v=abc123')
+
+    def fetch_captions(self, url, video_id):
+        """Stand-in for download_youtube_captions: stores the SRT fixture under MEDIA_ROOT."""
+        os.makedirs(os.path.join(self.media_root, 'captions'), exist_ok=True)
+        name = f'captions/youtube_{video_id}_abc123.en.srt'
+        shutil.copy(fixture_path('sample.srt'), os.path.join(self.media_root, name))
+        return name
+
+    @mock.patch('videos.tasks.encode', side_effect=fake_encode)
+    @mock.patch('videos.embeddings.encode', side_effect=fake_encode)
+    @mock.patch('videos.tasks.get_transcriber')
+    @mock.patch('videos.tasks.extract_audio')
+    @mock.patch('videos.tasks.download_youtube_video')
+    @mock.patch('videos.tasks.get_youtube_metadata', return_value={'duration': 3620})
+    def test_usable_captions_skip_download_and_transcription(self, metadata, download, extract_audio,
+                                                             get_transcriber, *_):
+        with mock.patch('videos.tasks.download_youtube_captions', side_effect=self.fetch_captions):
+            process_youtube_video(self.video.id)
+
+        download.assert_not_called()
+        extract_audio.assert_not_called()
+        get_transcriber.assert_not_called()
+
+        video = Video.objects.get(id=self.video.id)
+        self.assertEqual(video.status, 'ready')
+        self.assertFalse(video.file)
+        self.assertEqual(video.transcript_data, parse_caption_file(fixture_path('sample.srt')))
+        self.assertTrue(video.chunks.exists())
+
+    @mock.patch('videos.tasks.download_youtube_video', side_effect=Exception('download failed'))
+    @mock.patch('videos.tasks.get_youtube_metadata', return_value={'duration': 3 * 3600})
+    def test_captions_covering_too_little_download_the_media(self, metadata, download):
+        # The fixture ends at 1:00:15, not half of a three-hour video
+        with mock.patch('videos.tasks.download_youtube_captions', side_effect=self.fetch_captions):
+            process_youtube_video(self.video.id)
+
+        metadata.assert_called_with(self.video.youtube_url)
+        download.assert_called_once_with(self.video.youtube_url, self.video.id, 'audio')
+
+    @mock.patch('videos.tasks.download_youtube_video', side_effect=Exception('download failed'))
+    def test_missing_captions_download_the_media(self, download):
+        with mock.patch('videos.tasks.download_youtube_captions', return_value=None):
+            process_youtube_video(self.video.id)
+
+        download.assert_called_once_with(self.video.youtube_url, self.video.id, 'audio')
+        self.assertEqual(Video.objects.get(id=self.video.id).status, 'failed')
+
+class StageGraphTests(TransactionTestCase):
+    """run_stages; a TransactionTestCase because stages run in worker threads."""
+
+    def setUp(self):
+        user = User.objects.create_user('owner', password='password')
+        self.video = Video.objects.create(user=user, title='Lecture')
+        self.ran = []
+
+    def stage(self, name, after=(), error=None):
+        def run(results):
+            self.ran.append(name)
+            if error:
+                raise error
+            return name.upper()
+        return Stage(name, run, after=after)
+
+    def stage_status(self):
+        return Video.objects.get(id=self.video.id).stage_status
+
+    def test_results_follow_dependencies(self):
+        results = run_stages(self.video, [
+            self.stage('transcribe'), self.stage('chunk', after=['transcribe']),
+            self.stage('keyframes'), self.stage('analyze', after=['keyframes']),
+        ])
+
+        self.assertEqual(results, {'transcribe': 'TRANSCRIBE', 'chunk': 'CHUNK',
+                                   'keyframes': 'KEYFRAMES', 'analyze': 'ANALYZE'})
+        self.assertLess(self.ran.index('transcribe'), self.ran.index('chunk'))
+        self.assertLess(self.ran.index('keyframes'), self.ran.index('analyze'))
+        self.assertEqual(set(self.stage_status().values()), {'done'})
+
+    def test_failure_skips_dependents_and_raises_first_error(self):
+        error = RuntimeError('transcription failed')
+        with self.assertRaises(RuntimeError) as raised:
+            run_stages(self.video, [
+                self.stage('transcribe', error=error),
+                self.stage('chunk', after=['transcribe']),
+                self.stage('publish', after=['chunk']),
+            ], max_workers=1)
+
+        self.assertIs(raised.exception, error)
+        self.assertEqual(self.ran, ['transcribe'])
+        self.assertEqual(self.stage_status(), {'transcribe': 'failed', 'chunk': 'skipped', 'publish': 'skipped'})
+
+    def test_unknown_after_raises(self):
+        with self.assertRaisesMessage(ValueError, 'chunk comes after unknown stages: transcibe'):
+            run_stages(self.video, [self.stage('transcribe'), self.stage('chunk', after=['transcibe'])])
+        self.assertEqual(self.ran, [])
+
+    def test_cycle_raises(self):
+        with self.assertRaisesMessage(ValueError, 'Stages in a dependency cycle: a, b'):
+            run_stages(self.video, [
+                self.stage('a', after=['b']), self.stage('b', after=['a']), self.stage('c'),
+            ])
+
+        self.assertEqual(self.ran, ['c'])
+        self.assertEqual(self.stage_status(), {'a': 'skipped', 'b': 'skipped', 'c': 'done'})
+
+    def test_single_worker_runs_in_declaration_order(self):
+        run_stages(self.video, [
+            self.stage('keyframes'), self.stage('transcribe'),
+            self.stage('analyze', after=['keyframes']), self.stage('chunk', after=['transcribe']),
+        ], max_workers=1)
+
+        self.assertEqual(self.ran, ['keyframes', 'transcribe', 'analyze', 'chunk'])
+
+def slide_frames(seconds, fps, changes=(), drift=0.0, seed=0):
+    """
+    Synthetic grayscale slides at SCAN_WIDTH x SCAN_HEIGHT with +-4 levels of noise:
+    a new box appears at each time in `changes`, and `drift` brightens the whole
+    frame by that many gray levels per second.
+    """
+    rng = np.random.default_rng(seed)
+    frames = []
+    for idx in range(int(seconds * fps)):
+        timestamp = idx / fps
+        frame = np.full((SCAN_HEIGHT, SCAN_WIDTH), 60.0) + drift * timestamp
+        for box, change in enumerate(changes):
+            if timestamp >= change:
+                frame[20 + box * 40:50 + box * 40, 40:280] = 200
+        frame += rng.integers(-4, 5, frame.shape)
+        frames.append(np.clip(frame, 0, 255).astype(np.uint8))
+    return frames
+
+class DetectChangesTests(SimpleTestCase):
+    def test_static_noisy_frames_keep_the_first(self):
+        timestamps, scanned = detect_changes(slide_frames(40, 2), fps=2)
+        self.assertEqual(timestamps, [0.0])
+        self.assertEqual(scanned, 80)
+
+    def test_changes_are_picked_up(self):
+        timestamps, _ = detect_changes(slide_frames(60, 2, changes=(15, 30)), fps=2)
+        self.assertEqual(timestamps, [0.0, 15.0, 30.0])
+
+    def test_change_inside_min_interval_is_picked_up_after_it(self):
+        # The slide changes 3s after the first keyframe; by 10s it's no longer new
+        # compared with the previous frame, but it is compared with the last keyframe
+        timestamps, _ = detect_changes(slide_frames(20, 2, changes=(3,)), fps=2)
+        self.assertEqual(timestamps, [0.0, 10.0])
+
+    def test_gradual_change_adds_up(self):
+        # One gray level per second never moves a pixel past the tolerance between frames
+        timestamps, _ = detect_changes(slide_frames(25, 2, drift=1.0), fps=2)
+        self.assertEqual(timestamps, [0.0, 10.0, 20.0])
+
+    def test_extract_keyframes_picks_the_same_frames(self):
+        fps = 5
+        frames = slide_frames(40, fps, changes=(3, 22))
+        path = os.path.join(tempfile.mkdtemp(), 'slides.avi')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path), ignore_errors=True)
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (SCAN_WIDTH, SCAN_HEIGHT))
+        for frame in frames:
+            writer.write(cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR))
+        writer.release()
+
+        timestamps, _ = detect_changes(frames, fps)
+        self.assertEqual(timestamps, [0.0, 10.0, 22.0])
+        self.assertEqual([timestamp for timestamp, _ in extract_keyframes(path)], timestamps)
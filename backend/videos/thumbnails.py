@@ -0,0 +1,112 @@
+"""
+Keyframe thumbnails and sprite sheets.
+
+Each analyzed keyframe is stored as a downscaled WebP in VideoFrame.image
+(frames/<video id>/). Once a video is ready, its thumbnails are packed into sprite
+sheets under sprites/<video id>/ with two indexes next to them:
+- <token>.json: tile size, sheet names and each frame's timestamp and position,
+  referenced by Video.sprite_index and used by the frontend timeline strip
+- <token>.vtt: the same as a WebVTT thumbnails track ("sheet.webp#xywh=x,y,w,h")
+
+A timeline then loads one or two cacheable images instead of seeking the video.
+File names carry a build token, so a rebuilt sprite never hits a stale cache.
+"""
+import json
+import time
+from io import BytesIO
+from PIL import Image
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+# Tiles per sheet row, and rows per sheet (keeps sheets well under WebP's 16383px limit)
+SPRITE_COLUMNS = 10
+SPRITE_ROWS = 10
+
+def make_thumbnail(frame_bytes, width=None):
+    """Downscale an encoded frame (JPEG) to a WebP thumbnail `width` pixels wide."""
+    width = width or settings.FRAME_THUMBNAIL_WIDTH
+    image = Image.open(BytesIO(frame_bytes)).convert('RGB')
+    if image.width > width:
+        image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+    buffered = BytesIO()
+    image.save(buffered, format='WEBP', quality=settings.FRAME_THUMBNAIL_QUALITY, method=4)
+    return buffered.getvalue()
+
+def thumbnail_file(video, timestamp, frame_bytes):
+    """ContentFile for VideoFrame.image, named frames/<video id>/<milliseconds>.webp once saved."""
+    return ContentFile(make_thumbnail(frame_bytes), name=f'{video.id}/{round(timestamp * 1000)}.webp')
+
+def _vtt_timestamp(seconds):
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f'{int(hours):02d}:{int(minutes):02d}:{seconds:06.3f}'
+
+def build_sprite_sheet(video, duration=None):
+    """
+    Pack a video's stored frame thumbnails into sprite sheets with JSON and VTT indexes,
+    and point Video.sprite_index at the JSON.
+
+    Args:
+        video: Video model instance
+        duration: Media duration in seconds, used to end the last VTT cue
+
+    Returns:
+        Number of frames in the sprite, or 0 if the video has no thumbnails
+    """
+    from .models import VideoFrame
+    from .persistence import update_video
+    from .storage import delete_video_dirs
+
+    frames = [frame for frame in VideoFrame.objects.filter(video=video).exclude(image='').only('timestamp', 'image')
+              if frame.image]
+    delete_video_dirs(video.id, tops=('sprites',))
+    if not frames:
+        update_video(video, sprite_index=None)
+        return 0
+
+    tile_width = settings.SPRITE_TILE_WIDTH
+    with frames[0].image.open('rb') as f:
+        first = Image.open(f)
+        tile_height = round(first.height * tile_width / first.width)
+
+    token = str(int(time.time()))
+    directory = f'sprites/{video.id}'
+    per_sheet = SPRITE_COLUMNS * SPRITE_ROWS
+    index = {
+        'tile_width': tile_width,
+        'tile_height': tile_height,
+        'columns': SPRITE_COLUMNS,
+        'sheets': [],
+        'frames': [],
+    }
+    vtt = ['WEBVTT', '']
+
+    for sheet_number, start in enumerate(range(0, len(frames), per_sheet)):
+        batch = frames[start:start + per_sheet]
+        rows = (len(batch) + SPRITE_COLUMNS - 1) // SPRITE_COLUMNS
+        # Always a full row wide, so every sheet scales the same way in CSS
+        sheet = Image.new('RGB', (tile_width * SPRITE_COLUMNS, tile_height * rows))
+        sheet_name = f'{token}-{sheet_number}.webp'
+
+        for position, frame in enumerate(batch):
+            x, y = (position % SPRITE_COLUMNS) * tile_width, (position // SPRITE_COLUMNS) * tile_height
+            with frame.image.open('rb') as f:
+                sheet.paste(Image.open(f).convert('RGB').resize((tile_width, tile_height)), (x, y))
+
+            following = frames[start + position + 1] if start + position + 1 < len(frames) else None
+            end = following.timestamp if following else max(duration or 0, frame.timestamp + 1)
+            index['frames'].append({'timestamp': frame.timestamp, 'end': end, 'sheet': sheet_number, 'x': x, 'y': y})
+            vtt += [f'{_vtt_timestamp(frame.timestamp)} --> {_vtt_timestamp(end)}',
+                    f'{sheet_name}#xywh={x},{y},{tile_width},{tile_height}', '']
+
+        buffered = BytesIO()
+        sheet.save(buffered, format='WEBP', quality=settings.FRAME_THUMBNAIL_QUALITY, method=4)
+        default_storage.save(f'{directory}/{sheet_name}', ContentFile(buffered.getvalue()))
+        index['sheets'].append(sheet_name)
+
+    index['vtt'] = f'{token}.vtt'
+    default_storage.save(f'{directory}/{token}.vtt', ContentFile('\n'.join(vtt).encode()))
+    index_name = default_storage.save(f'{directory}/{token}.json', ContentFile(json.dumps(index).encode()))
+    update_video(video, sprite_index=index_name)
+    return len(frames)
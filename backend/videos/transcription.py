@@ -0,0 +1,106 @@
+import os
+import threading
+from django.conf import settings
+from .llm import get_openai_client, openai_timeout
+from .pipeline_metrics import record
+
+class Transcriber:
+    """
+    Turns an audio file into Whisper-style segments.
+
+    Every backend returns the same format, which is what chunk_transcript consumes:
+        [{'text': str, 'start': float, 'end': float}, ...]
+    """
+
+    name = None
+
+    def transcribe(self, audio_path, openai_key=None):
+        raise NotImplementedError
+
+class OpenAIWhisperTranscriber(Transcriber):
+    """Hosted OpenAI whisper-1 (uploads the audio, 25MB file cap)."""
+
+    name = 'openai'
+    max_size = 25 * 1024 * 1024  # 25MB
+
+    def transcribe(self, audio_path, openai_key=None):
+        # Check file size (25MB limit)
+        file_size = os.path.getsize(audio_path)
+        if file_size > self.max_size:
+            raise ValueError(f"Audio file too large: {file_size / 1024 / 1024:.1f}MB. Max: 25MB")
+
+        # Long uploads get their own (longer) timeout
+        client = get_openai_client(openai_key).with_options(timeout=openai_timeout(settings.OPENAI_TRANSCRIPTION_TIMEOUT))
+
+        with open(audio_path, "rb") as audio_file:
+            transcription = client.audio.transcriptions.create(
+                file=audio_file,
+                model="whisper-1",
+                response_format="verbose_json",
+                timestamp_granularities=["segment"]
+            )
+        record(api_calls=1, bytes_out=file_size)
+
+        return [
+            {'text': seg.text, 'start': seg.start, 'end': seg.end}
+            for seg in transcription.segments
+        ]
+
+class LocalWhisperTranscriber(Transcriber):
+    """
+    Offline CPU transcription with faster-whisper (CTranslate2, int8 by default).
+
+    One model is loaded per process and shared by all ingest threads. It runs
+    LOCAL_WHISPER_NUM_WORKERS transcriptions in parallel, each using
+    LOCAL_WHISPER_CPU_THREADS threads, so a worker box can transcribe several
+    lectures at once. Requires `pip install faster-whisper`.
+    """
+
+    name = 'local'
+    _model = None
+    _model_lock = threading.Lock()
+
+    @classmethod
+    def get_model(cls):
+        if cls._model is None:
+            with cls._model_lock:
+                if cls._model is None:
+                    try:
+                        from faster_whisper import WhisperModel
+                    except ImportError:
+                        raise RuntimeError(
+                            "The local transcription backend requires faster-whisper. "
+                            "Install it with: pip install faster-whisper"
+                        )
+                    cls._model = WhisperModel(
+                        settings.LOCAL_WHISPER_MODEL,
+                        device='cpu',
+                        compute_type=settings.LOCAL_WHISPER_COMPUTE_TYPE,
+                        cpu_threads=settings.LOCAL_WHISPER_CPU_THREADS,
+                        num_workers=settings.LOCAL_WHISPER_NUM_WORKERS,
+                    )
+        return cls._model
+
+    def transcribe(self, audio_path, openai_key=None):
+        model = self.get_model()
+        # segments is a lazy generator; decoding happens while we iterate
+        segments, _ = model.transcribe(audio_path, beam_size=5, vad_filter=True)
+        return [
+            {'text': seg.text, 'start': seg.start, 'end': seg.end}
+            for seg in segments
+        ]
+
+TRANSCRIBERS = {
+    OpenAIWhisperTranscriber.name: OpenAIWhisperTranscriber,
+    LocalWhisperTranscriber.name: LocalWhisperTranscriber,
+}
+
+def get_transcriber(name=None):
+    """
+    Return the transcriber for a backend name; falls back to the
+    deployment default (TRANSCRIPTION_BACKEND) when name is empty.
+    """
+    name = name or settings.TRANSCRIPTION_BACKEND
+    if name not in TRANSCRIBERS:
+        raise ValueError(f"Unknown transcription backend: {name}")
+    return TRANSCRIBERS[name]()
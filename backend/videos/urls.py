@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from .views import VideoViewSet, FetchYouTubeMetadataView, UserSettingsView, APIKeyView
+from .views import VideoViewSet, FetchYouTubeMetadataView, UserSettingsView, APIKeyView, ProcessingMetricsView
 from .auth_views import SignupView
 
 router = DefaultRouter()
@@ -15,4 +15,5 @@ urlpatterns = [
     path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('settings/', UserSettingsView.as_view(), name='user-settings'),
     path('settings/api-key/', APIKeyView.as_view(), name='api-key'),
+    path('processing-metrics/', ProcessingMetricsView.as_view(), name='processing-metrics'),
 ]
\ No newline at end of file
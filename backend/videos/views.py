@@ -1,13 +1,25 @@
-from rest_framework import viewsets
+from rest_framework import serializers, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from .models import Video, ChatSession, ChatMessage
-from .serializers import VideoSerializer, QuerySerializer
-from .utils import answer_question
+from django.db.models import Avg, Count, Max, Q, Sum
+from django.utils.dateparse import parse_datetime
+from karyon.metrics import ASK_LATENCY, INGEST_QUEUED, ingest_job
+from karyon.timing import span
+from .models import Video, ChatSession, ChatMessage, ProcessingMetric
+from .serializers import VideoSerializer, QuerySerializer, ProcessingMetricSerializer
+from .utils import answer_question, load_conversation_history
 from concurrent.futures import ThreadPoolExecutor
 from .tasks import process_video, process_youtube_video
+from .persistence import set_status
+from .storage import QuotaExceeded, check_quota, find_stored_blob, hash_upload, quota_bytes, storage_used
 from .youtube_utils import get_youtube_metadata
+import time
+
+def _run_ingest(kind, task, *args):
+    """Run a queued ingest task, tracking it in the ingest job metrics."""
+    with ingest_job(kind):
+        task(*args)
 
 class VideoViewSet(viewsets.ModelViewSet):
     """ViewSet for managing video uploads and retrievals."""
@@ -18,7 +30,23 @@ class VideoViewSet(viewsets.ModelViewSet):
         return Video.objects.filter(user=self.request.user)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        upload = serializer.validated_data.get('file')
+        if upload is None:
+            # YouTube videos are checked against the quota once downloaded
+            serializer.save(user=self.request.user)
+            return
+
+        # Identical content is stored once per user; the new row points at the existing file
+        content_hash = hash_upload(upload)
+        stored = find_stored_blob(content_hash, self.request.user)
+        try:
+            # A file the user already stores takes no extra space
+            check_quota(self.request.user, 0 if stored else upload.size)
+        except QuotaExceeded as e:
+            raise serializers.ValidationError({'file': str(e)})
+
+        serializer.save(user=self.request.user, file=stored or upload,
+                        content_hash=content_hash, file_size=upload.size)
 
     def create(self, request, *args, **kwargs):
         """Override create to trigger transcription after upload."""
@@ -37,9 +65,7 @@ class VideoViewSet(viewsets.ModelViewSet):
             openai_key = decrypt(profile.encrypted_openai_key)
 
         if not openai_key and not django_settings.OPENAI_API_KEY:
-            video.status = 'failed'
-            video.error_message = 'No OpenAI API key configured. Please add one in Settings.'
-            video.save()
+            set_status(video, 'failed', error_message='No OpenAI API key configured. Please add one in Settings.')
             response.data['status'] = 'failed'
             response.data['error_message'] = video.error_message
             return response
@@ -48,17 +74,21 @@ class VideoViewSet(viewsets.ModelViewSet):
         executor = ThreadPoolExecutor(max_workers=1)
 
         # Check if it's a YouTube URL or file upload
+        INGEST_QUEUED.inc()
         if video.youtube_url:
-            executor.submit(process_youtube_video, video_id, openai_key)
+            executor.submit(_run_ingest, 'youtube', process_youtube_video, video_id, openai_key)
         else:
-            executor.submit(process_video, video_id, openai_key)
+            executor.submit(_run_ingest, 'upload', process_video, video_id, openai_key)
 
         return response
     
     @action(detail=True, methods=['get'])
     def status(self, request, pk=None):
         video = self.get_object()
-        return Response({'status': video.status})
+        return Response({
+            'status': video.status,
+            'searchable_ranges': video.searchable_ranges,
+        })
 
     @action(detail=True, methods=['post'])
     def ask(self, request, pk=None):
@@ -68,7 +98,8 @@ class VideoViewSet(viewsets.ModelViewSet):
         POST /api/videos/{id}/ask/
         Body: {"question": "What is X?"}
         """
-        video = self.get_object()
+        with span('db'):
+            video = self.get_object()
 
         # Validate request
         serializer = QuerySerializer(data=request.data)
@@ -76,10 +107,9 @@ class VideoViewSet(viewsets.ModelViewSet):
         
         question = serializer.validated_data['question']
         max_distance = serializer.validated_data.get('max_distance', 1.5)
-        conversation_history = serializer.validated_data.get('conversation_history', [])
         
-        # Check if video is ready
-        if video.status != 'ready':
+        # Partially processed videos can be queried over whatever has been published so far
+        if not video.is_searchable:
             return Response(
                 {'error': f'Video is not ready yet. Status: {video.status}'},
                 status=400
@@ -101,10 +131,17 @@ class VideoViewSet(viewsets.ModelViewSet):
             session.save()
             return Response({'error': error_msg}, status=400)
 
+        # Conversation history comes from the stored chat, not the client
+        with span('history'):
+            session = ChatSession.objects.filter(video=video, user=request.user).first()
+            conversation_history = load_conversation_history(session)
+
         # Get answer using RAG
+        started = time.perf_counter()
         try:
             answer = answer_question(video, question, max_distance=max_distance, conversation_history=conversation_history, openai_key=openai_key)
         except Exception as e:
+            ASK_LATENCY.labels(outcome='error').observe(time.perf_counter() - started)
             error_msg = str(e) or 'Something went wrong. Please try again.'
             session, _ = ChatSession.objects.get_or_create(video=video, user=request.user)
             ChatMessage.objects.create(session=session, role='user', content=question)
@@ -112,14 +149,28 @@ class VideoViewSet(viewsets.ModelViewSet):
             session.save()
             return Response({'error': error_msg}, status=500)
 
+        ASK_LATENCY.labels(outcome='answered' if answer['has_answer'] else 'no_answer').observe(time.perf_counter() - started)
+
+        answer['partial'] = video.status != 'ready'
+        if answer['partial']:
+            answer['searchable_ranges'] = video.searchable_ranges
+
         # Save user message + assistant response to DB
-        session, _ = ChatSession.objects.get_or_create(video=video, user=request.user)
-        ChatMessage.objects.create(session=session, role='user', content=question)
-        ChatMessage.objects.create(session=session, role='assistant', content=answer['answer'], sources=answer)
-        session.save()  # Update updated_at timestamp
+        with span('persist'):
+            session, _ = ChatSession.objects.get_or_create(video=video, user=request.user)
+            ChatMessage.objects.create(session=session, role='user', content=question)
+            ChatMessage.objects.create(session=session, role='assistant', content=answer['answer'], sources=answer)
+            session.save()  # Update updated_at timestamp
 
         return Response(answer)
 
+    @action(detail=True, methods=['get'], url_path='processing-metrics')
+    def processing_metrics(self, request, pk=None):
+        """Per-stage timing and cost of this video's processing."""
+        video = self.get_object()
+        serializer = ProcessingMetricSerializer(video.processing_metrics.all(), many=True)
+        return Response({'metrics': serializer.data})
+
     @action(detail=True, methods=['get', 'delete'], url_path='chat')
     def chat(self, request, pk=None):
         """
@@ -154,13 +205,53 @@ class FetchYouTubeMetadataView(APIView):
         except Exception as e:
             return Response({'error': str(e)}, status=400)
 
+class ProcessingMetricsView(APIView):
+    """
+    Aggregated pipeline metrics per stage, for capacity planning.
+
+    GET /api/processing-metrics/?stage=transcribe&since=2026-01-01T00:00:00Z
+    Covers the user's own videos; staff see all videos.
+    """
+
+    def get(self, request):
+        metrics = ProcessingMetric.objects.all()
+        if not request.user.is_staff:
+            metrics = metrics.filter(video__user=request.user)
+        if request.query_params.get('stage'):
+            metrics = metrics.filter(stage=request.query_params['stage'])
+        if request.query_params.get('since'):
+            since = parse_datetime(request.query_params['since'])
+            if since is None:
+                return Response({'error': 'since must be an ISO 8601 datetime'}, status=400)
+            metrics = metrics.filter(started_at__gte=since)
+
+        stages = metrics.values('stage').annotate(
+            runs=Count('id'),
+            failures=Count('id', filter=Q(succeeded=False)),
+            videos=Count('video', distinct=True),
+            wall_time_avg=Avg('wall_time'),
+            wall_time_max=Max('wall_time'),
+            wall_time_total=Sum('wall_time'),
+            cpu_time_avg=Avg('cpu_time'),
+            cpu_time_total=Sum('cpu_time'),
+            bytes_in=Sum('bytes_in'),
+            bytes_out=Sum('bytes_out'),
+            api_calls=Sum('api_calls'),
+            tokens=Sum('tokens'),
+            frames_decoded=Sum('frames_decoded'),
+            frames_kept=Sum('frames_kept'),
+        ).order_by('stage')
+        return Response({'stages': list(stages)})
+
 class UserSettingsView(APIView):
-    """Get user settings (whether API key is set)."""
+    """Get user settings (whether API key is set, storage used against the quota)."""
 
     def get(self, request):
         profile = request.user.profile
         return Response({
             'has_openai_key': bool(profile.encrypted_openai_key),
+            'storage_used_bytes': storage_used(request.user),
+            'storage_quota_bytes': quota_bytes(),
         })
 
 class APIKeyView(APIView):
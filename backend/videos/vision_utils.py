@@ -5,15 +5,20 @@ from io import BytesIO
 from PIL import Image
 from django.core.files.base import ContentFile
 from django.conf import settings
-from openai import OpenAI
+from .demux import SCAN_HEIGHT, SCAN_THRESHOLD, SCAN_WIDTH, grab_frames, percent_changed
+from .llm import get_openai_client
+from .pipeline_metrics import record, track_stage
 
-def extract_keyframes(video_path, threshold=15.0, min_interval=10.0):
+# Analyzed frames are inserted in bulk, this many per transaction
+FRAME_SAVE_BATCH_SIZE = 16
+
+def extract_keyframes(video_path, threshold=SCAN_THRESHOLD, min_interval=10.0):
     """
     Extract keyframes from video when visual content changes significantly.
     
     Args:
         video_path: Path to video file
-        threshold: Percent of pixels that must change to count as keyframe (lower = more sensitive)
+        threshold: Percent of pixels that must change since the last keyframe (lower = more sensitive)
         min_interval: Minimum seconds between keyframes
     
     Returns:
@@ -23,7 +28,7 @@ def extract_keyframes(video_path, threshold=15.0, min_interval=10.0):
     fps = cap.get(cv2.CAP_PROP_FPS)
     
     keyframes = []
-    prev_gray = None  # Store grayscale version of previous frame for comparison
+    keyframe_gray = None  # Grayscale version of the last keyframe, to compare against
     prev_keyframe_time = -min_interval  # Start negative so first frame can be captured
     
     frame_idx = 0
@@ -38,24 +43,18 @@ def extract_keyframes(video_path, threshold=15.0, min_interval=10.0):
         
         # Convert frame to grayscale and resize for faster processing
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        gray_small = cv2.resize(gray, (320, 180))
+        gray_small = cv2.resize(gray, (SCAN_WIDTH, SCAN_HEIGHT))
         
         should_capture = False
         
         # First frame: always capture
-        if prev_gray is None:
+        if keyframe_gray is None:
             should_capture = True
         # Subsequent frames: check if enough time passed AND frame is different enough
         elif (timestamp - prev_keyframe_time) >= min_interval:
-            # Calculate absolute difference between current and previous frame
-            diff = cv2.absdiff(gray_small, prev_gray)
-            
-            # Calculate what percentage of total pixels changed
-            non_zero_count = cv2.countNonZero(diff)
-            total_pixels = gray_small.shape[0] * gray_small.shape[1]
-            percent_changed = (non_zero_count / total_pixels) * 100
-            
-            if percent_changed > threshold:
+            # Same rule as the single-pass demux (see demux.detect_changes): compared with
+            # the last keyframe, ignoring compression noise below SCAN_PIXEL_TOLERANCE
+            if percent_changed(gray_small, keyframe_gray) > threshold:
                 should_capture = True
         
         if should_capture:
@@ -71,11 +70,13 @@ def extract_keyframes(video_path, threshold=15.0, min_interval=10.0):
             keyframes.append((timestamp, buffered.getvalue()))
             
             prev_keyframe_time = timestamp
+            keyframe_gray = gray_small
         
-        prev_gray = gray_small
         frame_idx += 1
     
     cap.release()
+
+    record(frames_decoded=frame_idx, frames_kept=len(keyframes))
     
     return keyframes
 
@@ -90,7 +91,7 @@ def analyze_frame(frame_bytes, openai_key=None):
     Returns:
         String description of visual content
     """
-    client = OpenAI(api_key=openai_key or settings.OPENAI_API_KEY)
+    client = get_openai_client(openai_key)
     
     # Encode image to base64
     frame_b64 = base64.b64encode(frame_bytes).decode('utf-8')
@@ -127,6 +128,8 @@ def analyze_frame(frame_bytes, openai_key=None):
         temperature=0.2
     )
 
+    record(api_calls=1, tokens=response.usage.total_tokens if response.usage else 0)
+
     return response.choices[0].message.content.strip()
 
 def process_video_frames(video, openai_key=None):
@@ -141,36 +144,90 @@ def process_video_frames(video, openai_key=None):
     Returns:
         Number of frames extracted
     """
-    from .models import VideoFrame
-    from .embeddings import model as embed_model
+    return analyze_keyframes(video, scan_keyframes(video), openai_key=openai_key)
 
+def scan_keyframes(video, timestamps=None):
+    """
+    Scan a video's file for keyframes; returns a list of (timestamp, jpeg bytes).
+    If the timestamps were already picked by a single-pass demux (see videos/demux.py),
+    only those frames are decoded.
+    """
     video_path = video.file.path
-    keyframes = extract_keyframes(video_path, threshold=15.0, min_interval=10.0)
+    with track_stage(video, 'extract_keyframes') as stats:
+        if timestamps is None:
+            keyframes = extract_keyframes(video_path, min_interval=10.0)
+            stats.add(bytes_in=os.path.getsize(video_path))
+        else:
+            keyframes = grab_frames(video_path, timestamps)
+    return keyframes
+
+def analyze_keyframes(video, keyframes, openai_key=None):
+    """Analyze keyframes from scan_keyframes and store them as VideoFrame rows; returns the number stored."""
+    with track_stage(video, 'analyze_frames') as stats:
+        frames_created = _analyze_keyframes(video, keyframes, openai_key)
+        stats.add(frames_decoded=len(keyframes), frames_kept=frames_created)
+    return frames_created
+
+def _analyze_keyframes(video, keyframes, openai_key=None):
+    """Analyze extracted keyframes and store them as VideoFrame rows; returns the number stored."""
+    from karyon.metrics import FRAMES_ANALYZED
+    from .embeddings import encode
+    from .persistence import save_frames, update_video
+    from .ocr import local_analyze_frame
+    from .thumbnails import thumbnail_file
 
     frames_created = 0
-    for timestamp, frame_bytes in keyframes:
+    pending = []  # Analyzed frames waiting for the next bulk insert
+    stats = {'keyframes': len(keyframes), 'ocr': 0, 'vision': 0}
+    for idx, (timestamp, frame_bytes) in enumerate(keyframes):
         try:
-            # Analyze frame with GPT-4o
-            visual_context = analyze_frame(frame_bytes, openai_key=openai_key)
+            # Plain-text slides and blank frames are handled by local OCR;
+            # anything it can't handle confidently goes to GPT-4o
+            visual_context = local_analyze_frame(frame_bytes)
+            source = 'ocr'
+            if visual_context is None:
+                visual_context = analyze_frame(frame_bytes, openai_key=openai_key)
+                source = 'vision'
+            stats[source] += 1
+            FRAMES_ANALYZED.labels(source=source).inc()
 
             # Skip if nothing useful found
             if visual_context.count("None") >= 2:
                 continue
 
             # Embed the visual context text for semantic search
-            embedding = embed_model.encode(visual_context, show_progress_bar=False).tolist()
-
-            # Create frame record
-            frame = VideoFrame.objects.create(
-                video=video,
-                timestamp=timestamp,
-                visual_context=visual_context,
-                embedding=embedding
-            )
+            embedding = encode(visual_context, 'frames', show_progress_bar=False).tolist()
 
-            frames_created += 1
+            frame = {
+                'timestamp': timestamp,
+                'visual_context': visual_context,
+                'embedding': embedding,
+                'analysis_source': source,
+            }
+            if settings.FRAME_THUMBNAILS_ENABLED:
+                frame['image'] = thumbnail_file(video, timestamp, frame_bytes)
+            pending.append(frame)
 
         except Exception as e:
             print(f"Error processing frame at {timestamp:.1f}s: {str(e)}")
             continue
+
+        # Write frame records in batches, one transaction each, and publish them:
+        # everything up to the next keyframe is now covered by an analyzed frame
+        if len(pending) >= FRAME_SAVE_BATCH_SIZE:
+            frames_created += len(save_frames(video, pending))
+            pending = []
+            covered_until = keyframes[idx + 1][0] if idx + 1 < len(keyframes) else timestamp
+            update_video(video, visual_searchable_until=covered_until)
+
+    if pending:
+        frames_created += len(save_frames(video, pending))
+    if keyframes:
+        update_video(video, visual_searchable_until=keyframes[-1][0])
+
+    analyzed = stats['ocr'] + stats['vision']
+    stats['local_share'] = round(stats['ocr'] / analyzed, 3) if analyzed else 0.0
+    update_video(video, frame_analysis_stats=stats)
+    print(f"Video {video.id}: {stats['ocr']}/{analyzed} frames analyzed locally ({stats['local_share']:.0%})")
+
     return frames_created
\ No newline at end of file
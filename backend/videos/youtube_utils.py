@@ -1,12 +1,25 @@
 import yt_dlp
 import os
 from django.conf import settings
+from django.core.cache import caches
 from urllib.parse import urlparse, parse_qs
+from karyon.metrics import cache_lookup
+from .captions import pick_caption_track, parse_captions, captions_usable
 
-def clean_youtube_url(url):
+# Extractor settings shared by metadata lookups and downloads, so a cached info dict
+# (which includes the format list) can be downloaded from directly
+BASE_YDL_OPTS = {
+    'extractor_args': {
+        'youtube': {
+            'player_client': ['android'],
+        }
+    },
+}
+
+def youtube_video_id(url):
     """
-    Extract video ID from YouTube URL and return clean URL.
-    Handles various YouTube URL formats and strips unnecessary parameters.
+    Extract the video ID from a YouTube URL (youtube.com/watch?v=ID or youtu.be/ID).
+    Returns None for other URLs.
     """
     parsed = urlparse(url)
 
@@ -14,18 +27,52 @@ def clean_youtube_url(url):
     if 'youtube.com' in parsed.netloc:
         # Format: youtube.com/watch?v=VIDEO_ID
         query = parse_qs(parsed.query)
-        video_id = query.get('v', [None])[0]
+        return query.get('v', [None])[0]
     elif 'youtu.be' in parsed.netloc:
         # Format: youtu.be/VIDEO_ID
-        video_id = parsed.path.strip('/')
-    else:
-        # Unknown format, return as-is
-        return url
+        return parsed.path.strip('/') or None
+    return None
 
+def clean_youtube_url(url):
+    """
+    Extract video ID from YouTube URL and return clean URL.
+    Handles various YouTube URL formats and strips unnecessary parameters.
+    """
+    video_id = youtube_video_id(url)
     if video_id:
         return f"https://www.youtube.com/watch?v={video_id}"
+    # Unknown format, return as-is
     return url
 
+def get_youtube_info(url, refresh=False):
+    """
+    Return yt-dlp's extracted info dict for a video, from a TTL cache keyed by
+    video ID (YOUTUBE_INFO_CACHE_TTL seconds, shared by all workers).
+
+    Args:
+        url: YouTube URL in any supported format
+        refresh: Skip the cache and extract again (e.g. after format URLs expired)
+    """
+    url = clean_youtube_url(url)
+    video_id = youtube_video_id(url)
+    cache = caches['youtube']
+    cache_key = f'info:{video_id}'
+
+    if video_id and not refresh:
+        info_dict = cache.get(cache_key)
+        cache_lookup('youtube_info', info_dict is not None)
+        if info_dict is not None:
+            return info_dict
+
+    ydl_opts = {**BASE_YDL_OPTS, 'quiet': True, 'no_warnings': True}
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        # Sanitized like yt-dlp's --write-info-json, so it can be cached and fed to process_ie_result
+        info_dict = ydl.sanitize_info(ydl.extract_info(url, download=False))
+
+    if video_id:
+        cache.set(cache_key, info_dict, settings.YOUTUBE_INFO_CACHE_TTL)
+    return info_dict
+
 def download_youtube_video(url, video_id, processing_mode='both'):
     """
     Downloads a YouTube video and saves it to the media/videos/ directory.
@@ -58,54 +105,82 @@ def download_youtube_video(url, video_id, processing_mode='both'):
 
     # Configure yt_dlp options
     ydl_opts = {
+        **BASE_YDL_OPTS,
         'format': format_str,
         'outtmpl': os.path.join(output_dir, f'youtube_{video_id}_%(id)s.%(ext)s'),
         'quiet': False,
         'no_warnings': False,
         'merge_output_format': merge_format,
-        'extractor_args': {
-            'youtube': {
-                'player_client': ['android'],
-            }
-        },
     }
 
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info_dict = ydl.extract_info(url, download=True)
-            video_filename = ydl.prepare_filename(info_dict)
+        # Reuse the info extracted when the URL was pasted; if its format URLs have
+        # expired, extract once more and retry
+        for refresh in (False, True):
+            info_dict = get_youtube_info(url, refresh=refresh)
+            try:
+                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                    info_dict = ydl.process_ie_result(info_dict, download=True)
+                    video_filename = ydl.prepare_filename(info_dict)
+                break
+            except yt_dlp.utils.DownloadError:
+                if refresh:
+                    raise
 
-            # Return relative path to MEDIA_ROOT
-            relative_path = os.path.relpath(video_filename, settings.MEDIA_ROOT)
-            return relative_path
+        # Return relative path to MEDIA_ROOT
+        relative_path = os.path.relpath(video_filename, settings.MEDIA_ROOT)
+        return relative_path
     except Exception as e:
         raise Exception(f"Error downloading YouTube video: {str(e)}")
     
+def download_youtube_captions(url, video_id):
+    """
+    Fetch a usable caption track for a YouTube video, without downloading media.
+    Saves it to media/captions/ and returns the path relative to MEDIA_ROOT,
+    or None if the video has no usable captions.
+
+    Uploaded captions are preferred; automatic ones are used only if
+    YOUTUBE_USE_AUTO_CAPTIONS is set.
+    """
+    try:
+        info_dict = get_youtube_info(url)
+        track = pick_caption_track(info_dict, settings.YOUTUBE_CAPTION_LANGUAGES,
+                                   use_auto=settings.YOUTUBE_USE_AUTO_CAPTIONS)
+        if track is None:
+            return None
+        with yt_dlp.YoutubeDL({**BASE_YDL_OPTS, 'quiet': True, 'no_warnings': True}) as ydl:
+            caption_text = ydl.urlopen(track['url']).read().decode('utf-8')
+    except Exception as e:
+        raise Exception(f"Error fetching YouTube captions: {str(e)}")
+
+    segments = parse_captions(caption_text, track['ext'])
+    if not captions_usable(segments, duration=info_dict.get('duration')):
+        return None
+
+    output_dir = os.path.join(settings.MEDIA_ROOT, 'captions')
+    os.makedirs(output_dir, exist_ok=True)
+    filename = f"youtube_{video_id}_{info_dict['id']}.{track['language']}.{track['ext']}"
+    with open(os.path.join(output_dir, filename), 'w', encoding='utf-8') as f:
+        f.write(caption_text)
+    return os.path.join('captions', filename)
+
 def get_youtube_metadata(url):
     """
     Fetches metadata for a YouTube video without downloading it.
     Returns a dictionary with title and duration.
     """
-    # Clean URL to remove playlist and other unnecessary parameters
-    url = clean_youtube_url(url)
-
-    ydl_opts = {
-        'quiet': True,
-        'no_warnings': True,
-    }
-
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info_dict = ydl.extract_info(url, download=False)
-            title = info_dict.get('title', 'Unknown Title')
-            duration = info_dict.get('duration', 0)  # Duration in seconds
-            thumbnail = info_dict.get('thumbnail', '')
-            description = info_dict.get('description', '')
-            return {
-                'title': title,
-                'duration': duration,
-                'thumbnail': thumbnail,
-                'description': description
-            }
+        # Cached, so pasting the same URL again (or downloading it next) doesn't re-extract
+        info_dict = get_youtube_info(url)
+        title = info_dict.get('title', 'Unknown Title')
+        duration = info_dict.get('duration', 0)  # Duration in seconds
+        thumbnail = info_dict.get('thumbnail', '')
+        description = info_dict.get('description', '')
+        return {
+            'title': title,
+            'duration': duration,
+            'thumbnail': thumbnail,
+            'description': description
+        }
     except Exception as e:
         raise Exception(f"Error fetching YouTube metadata: {str(e)}")
\ No newline at end of file
@@ -30,7 +30,33 @@ export default function VideoChat({ video, onBack }) {
   const playerRef = useRef(null)
   const messagesContainerRef = useRef(null)
   const menuRef = useRef(null)
-  const videoSrc = useMemo(() => video ? mediaUrl(video.file) : null, [video?.id])
+  const videoSrc = useMemo(() => video ? mediaUrl(video.playback_file || video.file) : null, [video?.id, video?.playback_file])
+  // Audio-only YouTube videos ingested from captions have no local file; play them from YouTube
+  const youtubeId = useMemo(() => {
+    if (!video?.youtube_url) return null
+    try {
+      const url = new URL(video.youtube_url)
+      return url.searchParams.get('v') || url.pathname.slice(1) || null
+    } catch {
+      return null
+    }
+  }, [video?.youtube_url])
+  const [embedStart, setEmbedStart] = useState(0)
+  // Keyframe timeline: one sprite sheet image instead of seeking the video per preview
+  const [sprite, setSprite] = useState(null)
+
+  useEffect(() => {
+    setSprite(null)
+    if (!video?.sprite_index) return
+    const indexUrl = new URL(mediaUrl(video.sprite_index), window.location.href)
+    fetch(indexUrl)
+      .then(res => res.ok ? res.json() : null)
+      .then(index => index && setSprite({
+        ...index,
+        sheets: index.sheets.map(name => new URL(name, indexUrl).href)
+      }))
+      .catch(err => console.error('Failed to load sprite index:', err))
+  }, [video?.sprite_index])
 
   // Close menu when clicking outside
   useEffect(() => {
@@ -94,10 +120,6 @@ export default function VideoChat({ video, onBack }) {
     try {
       const response = await api.post(`/videos/${video.id}/ask/`, {
         question: question.trim(),
-        conversation_history: updatedMessages.map(msg => ({
-          role: msg.role,
-          content: msg.content
-        }))
       })
 
       const { answer, confidence, timestamp, segment_text, has_answer } = response.data
@@ -129,6 +151,8 @@ export default function VideoChat({ video, onBack }) {
     if (playerRef.current) {
       playerRef.current.currentTime = timestamp
       playerRef.current.play()
+    } else if (youtubeId) {
+      setEmbedStart(timestamp)
     }
   }
 
@@ -201,14 +225,45 @@ export default function VideoChat({ video, onBack }) {
         </div>
 
         <div className="aspect-video bg-gray-900 overflow-hidden border border-gray-200 shadow-boxy">
-          <video
-            key={video.id}
-            ref={playerRef}
-            src={videoSrc}
-            controls
-            className="w-full h-full object-contain"
-          />
+          {!videoSrc && youtubeId ? (
+            <iframe
+              key={`${video.id}-${embedStart}`}
+              src={`https://www.youtube.com/embed/${youtubeId}?start=${Math.floor(embedStart)}${embedStart ? '&autoplay=1' : ''}`}
+              title={video.title}
+              allow="autoplay; encrypted-media; picture-in-picture"
+              allowFullScreen
+              className="w-full h-full"
+            />
+          ) : (
+            <video
+              key={video.id}
+              ref={playerRef}
+              src={videoSrc}
+              controls
+              className="w-full h-full object-contain"
+            />
+          )}
         </div>
+
+        {sprite && (
+          <div className="mt-2 flex gap-1 overflow-x-auto pb-1">
+            {sprite.frames.map((frame) => (
+              <button
+                key={frame.timestamp}
+                onClick={() => seekToTimestamp(frame.timestamp)}
+                title={formatTimestamp(frame.timestamp)}
+                className="shrink-0 border border-gray-200 hover:border-orange-500"
+                style={{
+                  width: sprite.tile_width / 2,
+                  height: sprite.tile_height / 2,
+                  backgroundImage: `url(${sprite.sheets[frame.sheet]})`,
+                  backgroundPosition: `-${frame.x / 2}px -${frame.y / 2}px`,
+                  backgroundSize: `${sprite.columns * sprite.tile_width / 2}px auto`
+                }}
+              />
+            ))}
+          </div>
+        )}
       </div>
 
       {/* Chat Interface */}
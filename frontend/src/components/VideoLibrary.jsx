@@ -22,6 +22,31 @@ export default function VideoLibrary({ videos, onSelectVideo, onRefresh }) {
     }
   }, [videos, onRefresh])
 
+  // Processing videos can be opened once part of them is searchable
+  const canOpen = (video) =>
+    video.status === 'ready' ||
+    (video.status === 'processing' && Object.keys(video.searchable_ranges || {}).length > 0)
+
+  // Audio and visual stages run side by side; show both branches' progress
+  const stageLabels = {
+    demux: 'Decoding',
+    transcribe: 'Transcribing',
+    chunk: 'Indexing transcript',
+    extract_keyframes: 'Scanning frames',
+    analyze_frames: 'Analyzing frames'
+  }
+
+  const runningStages = (video) =>
+    Object.entries(video.stage_status || {})
+      .filter(([, state]) => state === 'running')
+      .map(([stage]) => stageLabels[stage] || stage)
+
+  const stageProgress = (video) => {
+    const states = Object.values(video.stage_status || {})
+    if (states.length === 0) return 10
+    return Math.max(10, Math.round(100 * states.filter(state => state === 'done').length / states.length))
+  }
+
   const getStatusBadge = (status) => {
     const styles = {
       pending: 'bg-yellow-50 text-yellow-700 border-yellow-200',
@@ -121,11 +146,11 @@ export default function VideoLibrary({ videos, onSelectVideo, onRefresh }) {
                 ? 'border-orange-500 shadow-boxy-orange'
                 : 'border-gray-200'
             } ${
-              video.status === 'ready'
+              canOpen(video)
                 ? 'cursor-pointer hover:border-orange-300 hover:shadow-boxy-hover hover:-translate-y-0.5'
                 : 'opacity-75'
             }`}
-            onClick={() => video.status === 'ready' && onSelectVideo(video.id)}
+            onClick={() => canOpen(video) && onSelectVideo(video.id)}
           >
             <div className="relative">
               <div className="aspect-video bg-gray-900 flex items-center justify-center overflow-hidden">
@@ -221,8 +246,11 @@ export default function VideoLibrary({ videos, onSelectVideo, onRefresh }) {
               {video.status === 'processing' && (
                 <div className="mt-2">
                   <div className="w-full bg-gray-200 h-0.5">
-                    <div className="bg-orange-500 h-0.5 animate-pulse" style={{ width: '60%' }} />
+                    <div className="bg-orange-500 h-0.5 animate-pulse" style={{ width: `${stageProgress(video)}%` }} />
                   </div>
+                  {runningStages(video).length > 0 && (
+                    <p className="mt-1 text-xs text-gray-400">{runningStages(video).join(' · ')}</p>
+                  )}
                 </div>
               )}
             </div>
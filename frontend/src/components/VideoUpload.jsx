@@ -4,6 +4,7 @@ import api from '../api'
 export default function VideoUpload({ onUploadComplete }) {
   const [uploadMode, setUploadMode] = useState('file')
   const [file, setFile] = useState(null)
+  const [captionFile, setCaptionFile] = useState(null)
   const [youtubeUrl, setYoutubeUrl] = useState('')
   const [title, setTitle] = useState('')
   const [processingMode, setProcessingMode] = useState('both')
@@ -140,6 +141,9 @@ export default function VideoUpload({ onUploadComplete }) {
         formData.append('file', file)
         formData.append('title', title)
         formData.append('processing_mode', processingMode)
+        if (captionFile && processingMode !== 'visual') {
+          formData.append('caption_file', captionFile)
+        }
 
         response = await api.post('/videos/', formData, {
           headers: { 'Content-Type': 'multipart/form-data' },
@@ -163,6 +167,7 @@ export default function VideoUpload({ onUploadComplete }) {
       }
 
       setFile(null)
+      setCaptionFile(null)
       setYoutubeUrl('')
       setTitle('')
       setProcessingMode('both')
@@ -172,7 +177,7 @@ export default function VideoUpload({ onUploadComplete }) {
       onUploadComplete()
     } catch (error) {
       console.error('Upload failed:', error)
-      alert('Upload failed: ' + (error.response?.data?.detail || error.message))
+      alert('Upload failed: ' + (error.response?.data?.detail || error.response?.data?.caption_file?.[0] || error.message))
     } finally {
       setUploading(false)
     }
@@ -322,6 +327,19 @@ export default function VideoUpload({ onUploadComplete }) {
               className="w-full px-3 py-1.5 border border-gray-300 text-sm focus:outline-none focus:border-orange-500"
             />
 
+            {processingMode !== 'visual' && (
+              <label className="flex items-center justify-center gap-2 text-xs text-gray-500">
+                <span>Captions (optional, used instead of transcription):</span>
+                <input
+                  type="file"
+                  accept=".srt,.vtt"
+                  onChange={(e) => setCaptionFile(e.target.files?.[0] || null)}
+                  disabled={uploading}
+                  className="text-xs"
+                />
+              </label>
+            )}
+
             {uploading && (
               <div className="space-y-2">
                 <div className="w-full bg-gray-200 h-1">
@@ -343,7 +361,7 @@ export default function VideoUpload({ onUploadComplete }) {
                 {uploading ? 'Uploading...' : 'Upload'}
               </button>
               <button
-                onClick={() => { setFile(null); setTitle('') }}
+                onClick={() => { setFile(null); setCaptionFile(null); setTitle('') }}
                 disabled={uploading}
                 className="px-4 py-1.5 border border-gray-300 text-gray-600 hover:border-gray-400 disabled:opacity-50 disabled:hover:border-gray-300 text-sm font-mono-brand tracking-wide"
               >